@@ -2,6 +2,7 @@
 from imports import *
 from backend.routes.api_routes import api_bp, api_test
 from backend.routes.socket_events import register_socket_events
+from backend.services.profile_service import profile_service
 
 
 def create_app():
@@ -9,6 +10,7 @@ def create_app():
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(api_test, url_prefix='/api/test')
     CORS(app, supports_credentials=True)
+    profile_service.init_app(app)  # 按需请求剖析
     return app
 
 
@@ -0,0 +1,104 @@
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+try:  # 缓存 scipy 的 LAPACK LU 分解；未安装 scipy 时退回缓存 numpy（同为 LAPACK）求得的逆矩阵
+    from scipy import linalg as scipy_linalg
+except ImportError:
+    scipy_linalg = None
+
+DEFAULT_CACHE_SIZE = 16  # 缓存的分解个数（约等于同时活跃的拓扑数）
+
+
+def factorize(matrix):
+    """
+    分解方阵以便对不同右端项反复求解
+    仅在出现精确为零的主元时判定为奇异（不按整体幅值设容差，避免误判尺度悬殊但良态的矩阵）
+    :return: ('lu', (lu, piv)) 或 ('inv', 逆矩阵)
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError(f"只能分解方阵，当前形状 {matrix.shape}")
+    if scipy_linalg is not None:
+        lu, piv = scipy_linalg.lu_factor(matrix, check_finite=False)
+        if not np.all(np.diag(lu)):
+            raise np.linalg.LinAlgError("矩阵奇异（存在零主元）")
+        return 'lu', (lu, piv)
+    return 'inv', np.linalg.inv(matrix)
+
+
+def solve_factorized(factor: tuple, rhs) -> np.ndarray:
+    """
+    用 factorize 的结果求解 M·x = rhs
+    :param rhs: 形状 (n,) 的单个右端项，或 (n, k) 的 k 个右端项（按列批量求解）
+    """
+    kind, data = factor
+    b = np.asarray(rhs, dtype=float)
+    n = data[0].shape[0] if kind == 'lu' else data.shape[0]
+    if b.shape[0] != n:
+        raise ValueError(f"右端项行数 {b.shape[0]} 与矩阵维度 {n} 不一致")
+    if kind == 'lu':
+        return scipy_linalg.lu_solve(data, b, check_finite=False)
+    return data @ b
+
+
+def matrix_key(matrix: np.ndarray) -> tuple:
+    """按矩阵内容计算缓存键（形状 + 内容摘要）"""
+    matrix = np.ascontiguousarray(matrix, dtype=float)
+    return matrix.shape, hashlib.blake2b(matrix.tobytes(), digest_size=16).digest()
+
+
+class FactorizationCache:
+    """
+    矩阵分解缓存（按矩阵内容索引，LRU 淘汰）
+    同一矩阵配合不同右端项反复求解时只分解一次
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._entries = OrderedDict()  # 缓存键 -> factorize 的结果
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, matrix, key: tuple = None) -> tuple:
+        """取出矩阵的分解，未命中时分解并缓存"""
+        key = key if key is not None else matrix_key(matrix)
+        with self._lock:
+            factor = self._entries.get(key)
+            if factor is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return factor
+            self.misses += 1
+        factor = factorize(matrix)
+        with self._lock:
+            self._entries[key] = factor
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return factor
+
+    def solve(self, matrix, rhs) -> np.ndarray:
+        return solve_factorized(self.get(matrix), rhs)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+factorization_cache = FactorizationCache()
@@ -1,4 +1,5 @@
 from imports import *
+from backend.cirSim.luSolver import factorization_cache, solve_factorized
 
 
 class SimMatrix:
@@ -44,6 +45,14 @@ class SimMatrix:
             if state != 0:
                 return state
 
+    def solve(self, rhs=None) -> np.ndarray:
+        """
+        求解 matrix · x = rhs（同一矩阵只分解一次，分解结果按矩阵内容缓存）
+        :param rhs: 缺省为 rightSide；可传入 (n,) 单个右端项或 (n, k) 批量右端项（每列一种工况）
+        """
+        factor = factorization_cache.get(np.asarray(self.matrix, dtype=float))
+        return solve_factorized(factor, self.rightSide if rhs is None else rhs)
+
     def resistor_handler(self, device: dict):
         print(f"type = {device['type']}")
         r0 = 1 / device['value']
@@ -2,6 +2,171 @@ import struct
 import numpy as np
 from typing import Union
 
+HEADER_SIZE = 6  # cmd(2) + ext_info(2) + length(2)
+MAX_FRAME_DATA = 0xFFFF - 2  # 长度字段 16 位，且包含 2 字节校验和
+MAX_DIM = 0xFF  # 拓展信息中维度字段为 8 位
+
+CMD_SEGMENT = 0x0008  # 分段数据帧，拓展信息为分段序号
+OP_SEGMENT_BEGIN = 0x30  # 分段传输开始（CMD 0x0000）
+OP_SEGMENT_ACK = 0x31  # 下位机确认收到分段（CMD 0x0000，数据为序号）
+OP_SEGMENT_DONE = 0x33  # 下位机完成重组（CMD 0x0000，数据为目标命令字）
+SEGMENT_BEGIN_SEQ = 0xFFFF  # 确认开始帧时使用的序号
+DEFAULT_FRAGMENT_SIZE = 1024  # 默认分段大小（字节）
+
+# 矩阵命令字 -> 名称
+MATRIX_CMDS = {
+    0x0001: "A",
+    0x0002: "G_inv",
+    0x0003: "J",
+    0x0004: "attr",
+    0x0005: "YL",
+    0x0006: "YC",
+    0x0007: "YR",
+}
+MATRIX_NAMES = {name: cmd for cmd, name in MATRIX_CMDS.items()}
+
+# 各矩阵命令字的数据段编码类型（未列出的为 float32 小端）
+PACK_DTYPES = {0x0001: np.dtype(np.int8)}
+
+
+def calc_checksum(data: bytes) -> int:
+    """带进位累加的校验和计算（逐字节累加、溢出回卷，等价于 16 位端回进位折叠）"""
+    checksum = int(np.frombuffer(data, dtype=np.uint8).sum(dtype=np.uint64))
+    while checksum > 0xFFFF:
+        checksum = (checksum & 0xFFFF) + (checksum >> 16)
+    return checksum
+
+
+def validate_matrix(cmd: int, matrix: np.ndarray):
+    """按命令字检查矩阵形状与类型（单帧、分段与紧凑编码发送共用）"""
+    if cmd == 0x0001:
+        if matrix.ndim != 2 or matrix.dtype != np.int8:
+            raise ValueError("A矩阵必须为int8类型的二维数组")
+    elif cmd == 0x0002:
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError("G_inv必须为方阵")
+    elif matrix.ndim != 2 or matrix.shape[1] != 1:
+        raise ValueError(f"{MATRIX_CMDS[cmd]}必须为单列向量")
+
+
+def pack_matrix(cmd: int, matrix: np.ndarray) -> bytes:
+    """按命令字对应的类型将矩阵展平打包"""
+    return np.ascontiguousarray(matrix, dtype=PACK_DTYPES.get(cmd, np.dtype('<f4'))).tobytes()
+
+
+def needs_segmentation(cmd: int, matrix: np.ndarray, data_len: int = None) -> bool:
+    """矩阵是否超出单帧长度或拓展信息维度限制（data_len 为编码后的数据段长度，缺省按稠密编码计算）"""
+    matrix = np.asarray(matrix)
+    if data_len is None:
+        data_len = matrix.size * PACK_DTYPES.get(cmd, np.dtype('<f4')).itemsize
+    if data_len > MAX_FRAME_DATA:
+        return True
+    if cmd == 0x0001:
+        return matrix.shape[1] > 0xFFFF
+    return matrix.shape[0] > MAX_DIM
+
+
+# 紧凑编码（命令字高字节携带编码类型，数据段以 行数(2)|列数(2) 开头）
+ENC_DENSE = 0x00  # 原始稠密编码
+ENC_TERNARY = 0x01  # {-1,0,1} 矩阵按 2 bit 打包（00=0, 01=1, 10=-1），每字节 4 个元素
+ENC_SYM_UPPER = 0x02  # 对称方阵仅发送上三角（含对角线），按行展开
+ENC_SPARSE = 0x03  # 非零个数(4) | 展平索引(u16/u32) | 非零值
+_TERNARY_CODES = np.array([0, 1, -1], dtype=np.int8)
+
+
+def _sparse_index_dtype(size: int) -> np.dtype:
+    return np.dtype('<u2') if size <= 0x10000 else np.dtype('<u4')
+
+
+def encode_compact(cmd: int, matrix: np.ndarray) -> tuple:
+    """
+    对矩阵尝试所有适用的编码，返回数据段最短者
+    :return: (编码类型, 数据段)
+    """
+    matrix = np.asarray(matrix)
+    dtype = PACK_DTYPES.get(cmd, np.dtype('<f4'))
+    values = np.ascontiguousarray(matrix, dtype=dtype)
+    rows, cols = values.shape
+    prefix = struct.pack('>HH', rows, cols)
+    candidates = [(ENC_DENSE, values.tobytes())]
+
+    flat = values.ravel()
+    if cmd == 0x0001 and np.isin(flat, (-1, 0, 1)).all():
+        codes = np.where(flat < 0, 2, flat).astype(np.uint8)
+        codes = np.concatenate((codes, np.zeros(-len(codes) % 4, dtype=np.uint8))).reshape(-1, 4)
+        packed = codes[:, 0] | codes[:, 1] << 2 | codes[:, 2] << 4 | codes[:, 3] << 6
+        candidates.append((ENC_TERNARY, prefix + packed.astype(np.uint8).tobytes()))
+    if rows == cols and np.array_equal(values, values.T):
+        candidates.append((ENC_SYM_UPPER, prefix + values[np.triu_indices(rows)].tobytes()))
+    index = np.flatnonzero(flat)
+    sparse_len = 8 + len(index) * (_sparse_index_dtype(flat.size).itemsize + dtype.itemsize)
+    if sparse_len < len(candidates[0][1]):
+        candidates.append((ENC_SPARSE, prefix + struct.pack('>I', len(index))
+                           + index.astype(_sparse_index_dtype(flat.size)).tobytes() + flat[index].tobytes()))
+    return min(candidates, key=lambda c: len(c[1]))
+
+
+def decode_compact(cmd: int, encoding: int, data: bytes) -> np.ndarray:
+    """encode_compact 的逆过程（下位机侧解码）"""
+    dtype = PACK_DTYPES.get(cmd, np.dtype('<f4'))
+    rows, cols = struct.unpack_from('>HH', data)
+    body = memoryview(data)[4:]
+    if encoding == ENC_TERNARY:
+        packed = np.frombuffer(body, dtype=np.uint8)
+        codes = np.stack([(packed >> shift) & 0x3 for shift in (0, 2, 4, 6)], axis=1).ravel()
+        return _TERNARY_CODES[codes[:rows * cols]].astype(dtype).reshape(rows, cols)
+    if encoding == ENC_SYM_UPPER:
+        matrix = np.zeros((rows, cols), dtype=dtype)
+        iu = np.triu_indices(rows)
+        matrix[iu] = np.frombuffer(body, dtype=dtype)
+        matrix.T[iu] = matrix[iu]
+        return matrix
+    if encoding == ENC_SPARSE:
+        nnz, = struct.unpack_from('>I', body)
+        index_dtype = _sparse_index_dtype(rows * cols)
+        index = np.frombuffer(body, dtype=index_dtype, count=nnz, offset=4)
+        values = np.frombuffer(body, dtype=dtype, count=nnz, offset=4 + nnz * index_dtype.itemsize)
+        matrix = np.zeros(rows * cols, dtype=dtype)
+        matrix[index] = values
+        return matrix.reshape(rows, cols)
+    raise ValueError(f"未知的编码类型 0x{encoding:02X}")
+
+
+class FrameParser:
+    """
+    协议帧解析器（接收方向）
+    feed() 接收任意切分的字节流，返回完整且校验通过的帧列表 [(cmd, ext_info, data), ...]
+    校验失败时丢弃一个字节重新同步，丢弃计数记录在 dropped
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.dropped = 0
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += chunk
+        frames = []
+        buf = self._buffer
+        pos = 0
+        while len(buf) - pos >= HEADER_SIZE + 2:
+            cmd, ext_info, length = struct.unpack_from('>HHH', buf, pos)
+            end = pos + HEADER_SIZE + length
+            if length < 2:
+                pos += 1
+                self.dropped += 1
+                continue
+            if end > len(buf):
+                break
+            checksum, = struct.unpack_from('>H', buf, end - 2)
+            if calc_checksum(buf[pos:end - 2]) != checksum:
+                pos += 1
+                self.dropped += 1
+                continue
+            frames.append((cmd, ext_info, bytes(buf[pos + HEADER_SIZE:end - 2])))
+            pos = end
+        del buf[:pos]
+        return frames
+
 
 class MatrixSender:
     """
@@ -13,6 +178,9 @@ class MatrixSender:
     | send_clear          | 清除矩阵（0x0000 01）|
     | send_start          | 启动仿真（0x0000 02）|
     | send_stop           | 停止仿真（0x0000 03）|
+    | send_ping           | 往返时延探测（0x0000 20）|
+    | send_segmented      | 大矩阵分段传输（0x0008）|
+    | send_compact        | 紧凑编码发送矩阵     |
     | send_A              | 发送导纳矩阵A        |
     | send_G_inv          | 发送导纳逆矩阵G_inv  |
     | send_J              | 发送历史电流源J      |
@@ -28,12 +196,7 @@ class MatrixSender:
 
     def _calc_checksum(self, data: bytes) -> int:
         """带进位累加的校验和计算"""
-        checksum = 0
-        for byte in data:
-            checksum += byte
-            if checksum > 0xFFFF:
-                checksum = (checksum & 0xFFFF) + 1
-        return checksum
+        return calc_checksum(data)
 
     def _build_header(self, cmd: int, ext_info: int, data_len: int) -> bytes:
         """构建协议头（大端序）"""
@@ -57,6 +220,15 @@ class MatrixSender:
         checksum = self._calc_checksum(header + data)
         return header + data + struct.pack('>H', checksum)
 
+    def send_stop(self) -> bytes:
+        """停止仿真（CMD 0x0000 操作码0x03）"""
+        cmd = 0x0000
+        ext_info = 0x03
+        data = struct.pack('>H', 0x5555)
+        header = self._build_header(cmd, ext_info, len(data))
+        checksum = self._calc_checksum(header + data)
+        return header + data + struct.pack('>H', checksum)
+
     def send_matrix_id(self) -> bytes:
         """启动仿真（CMD 0x0000 操作码0x10）"""
         cmd = 0x0000
@@ -66,6 +238,79 @@ class MatrixSender:
         checksum = self._calc_checksum(header + data)
         return header + data + struct.pack('>H', checksum)
 
+    def send_ping(self, seq: int) -> bytes:
+        """往返时延探测（CMD 0x0000 操作码0x20），下位机以操作码0x21原样回传数据段"""
+        cmd = 0x0000
+        ext_info = 0x20
+        data = struct.pack('>I', seq & 0xFFFFFFFF)  # 大端序 4 字节序号
+        header = self._build_header(cmd, ext_info, len(data))
+        checksum = self._calc_checksum(header + data)
+        return header + data + struct.pack('>H', checksum)
+
+    def send_compact(self, cmd: int, matrix: np.ndarray) -> bytes:
+        """紧凑编码发送矩阵（命令字高字节为编码类型，由 encode_compact 选择最短编码）"""
+        packet = self.send_encoded(cmd, matrix, compact=True)
+        if not isinstance(packet, bytes):
+            raise ValueError("数据段超出单帧长度限制，请使用分段传输")
+        return packet
+
+    def send_segmented(self, cmd: int, matrix: np.ndarray,
+                       fragment_size: int = DEFAULT_FRAGMENT_SIZE, compact: bool = False) -> tuple:
+        """
+        大矩阵分段传输（开始帧 CMD 0x0000 操作码0x30 + 若干分段帧 CMD 0x0008）
+        开始帧数据：目标命令字(2) | 行数(2) | 列数(2) | 总字节数(4) | 分段数(2) | 分段大小(2)
+        分段帧拓展信息为序号，每帧自带校验和；由下位机逐段确认
+        compact=True 时目标命令字高字节为编码类型，分段内容为紧凑编码后的数据段
+        :return: (开始帧, [分段帧, ...])
+        """
+        matrix = np.asarray(matrix)
+        validate_matrix(cmd, matrix)
+        encoding, data = encode_compact(cmd, matrix) if compact else (ENC_DENSE, pack_matrix(cmd, matrix))
+        return self._segment_frames(cmd | encoding << 8, matrix.shape, data, fragment_size)
+
+    def send_encoded(self, cmd: int, matrix: np.ndarray, compact: bool = False,
+                     fragment_size: int = DEFAULT_FRAGMENT_SIZE):
+        """
+        按数据量自动选择单帧或分段发送，compact=True 时同时选择最短编码
+        :return: 单帧 bytes，或分段传输的 (开始帧, [分段帧, ...])
+        """
+        matrix = np.asarray(matrix)
+        validate_matrix(cmd, matrix)
+        encoding, data = encode_compact(cmd, matrix) if compact else (ENC_DENSE, pack_matrix(cmd, matrix))
+        # 紧凑编码在数据段内携带行列数，只受长度限制；稠密编码还受拓展信息维度限制
+        if len(data) > MAX_FRAME_DATA or (encoding == ENC_DENSE and needs_segmentation(cmd, matrix, len(data))):
+            return self._segment_frames(cmd | encoding << 8, matrix.shape, data, fragment_size)
+        header = self._build_header(cmd | encoding << 8, self._ext_info(cmd, matrix), len(data))
+        checksum = self._calc_checksum(header + data)
+        return header + data + struct.pack('>H', checksum)
+
+    def _segment_frames(self, cmd: int, shape: tuple, data: bytes, fragment_size: int) -> tuple:
+        rows, cols = shape
+        count = -(-len(data) // fragment_size)
+        if rows > 0xFFFF or cols > 0xFFFF or count >= SEGMENT_BEGIN_SEQ:
+            raise ValueError("矩阵超出分段传输限制")
+
+        begin_data = struct.pack('>HHHIHH', cmd, rows, cols, len(data), count, fragment_size)
+        header = self._build_header(0x0000, OP_SEGMENT_BEGIN, len(begin_data))
+        begin = header + begin_data + struct.pack('>H', self._calc_checksum(header + begin_data))
+
+        fragments = []
+        view = memoryview(data)
+        for seq in range(count):
+            chunk = view[seq * fragment_size:(seq + 1) * fragment_size]
+            header = self._build_header(CMD_SEGMENT, seq, len(chunk))
+            checksum = self._calc_checksum(header + chunk)
+            fragments.append(header + chunk + struct.pack('>H', checksum))
+        return begin, fragments
+
+    @staticmethod
+    def _ext_info(cmd: int, matrix: np.ndarray) -> int:
+        """矩阵帧的拓展信息"""
+        if cmd == 0x0001:  # A矩阵特殊处理（列数）
+            return matrix.shape[1]
+        dim = matrix.shape[0] if cmd in [0x0003, 0x0005, 0x0006, 0x0007] else matrix.shape[1]
+        return dim & 0xFF
+
     def send_matrix(self, cmd: int, matrix: np.ndarray,
                     shape_validator: callable, data_packer: callable) -> bytes:
         """通用矩阵发送方法"""
@@ -73,12 +318,7 @@ class MatrixSender:
         shape_validator(matrix)  # 验证矩阵形状
 
         # 构造拓展信息
-        if cmd == 0x0001:  # A矩阵特殊处理（列数）
-            cols = matrix.shape[1]
-            ext_info = cols
-        else:
-            dim = matrix.shape[0] if cmd in [0x0003, 0x0005, 0x0006, 0x0007] else matrix.shape[1]
-            ext_info = (dim & 0xFF)
+        ext_info = self._ext_info(cmd, matrix)
 
         # 数据打包
         data = data_packer(matrix)
@@ -90,59 +330,34 @@ class MatrixSender:
 
     # 以下是各矩阵的专用发送方法
     def send_A(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.dtype != np.int8:
-                raise ValueError("A矩阵必须为int8类型的二维数组")
-
-        return self.send_matrix(0x0001, matrix, validator,
-                                lambda m: b''.join(struct.pack('b', v) for v in m.flatten()))
+        return self.send_matrix(0x0001, matrix, lambda m: validate_matrix(0x0001, m),
+                                lambda m: pack_matrix(0x0001, m))
 
     def send_G_inv(self, matrix: np.ndarray) -> bytes:
         def validator(m):
-            if m.ndim != 2 or m.shape[0] != m.shape[1]:
-                raise ValueError("G_inv必须为方阵")
+            validate_matrix(0x0002, m)
             if m.shape[0] > 0xFF:
                 raise ValueError("矩阵维度超过255限制")
 
         return self.send_matrix(0x0002, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+                                lambda m: pack_matrix(0x0002, m))
 
     def send_J(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.shape[1] != 1:
-                raise ValueError("J必须为单列向量")
-
-        return self.send_matrix(0x0003, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+        return self.send_matrix(0x0003, matrix, lambda m: validate_matrix(0x0003, m),
+                                lambda m: pack_matrix(0x0003, m))
 
     def send_attr(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.shape[1] != 1:
-                raise ValueError("attr必须为单列向量")
-
-        return self.send_matrix(0x0004, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+        return self.send_matrix(0x0004, matrix, lambda m: validate_matrix(0x0004, m),
+                                lambda m: pack_matrix(0x0004, m))
 
     def send_YL(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.shape[1] != 1:
-                raise ValueError("YL必须为单列向量")
-
-        return self.send_matrix(0x0005, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+        return self.send_matrix(0x0005, matrix, lambda m: validate_matrix(0x0005, m),
+                                lambda m: pack_matrix(0x0005, m))
 
     def send_YC(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.shape[1] != 1:
-                raise ValueError("YC必须为单列向量")
-
-        return self.send_matrix(0x0006, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+        return self.send_matrix(0x0006, matrix, lambda m: validate_matrix(0x0006, m),
+                                lambda m: pack_matrix(0x0006, m))
 
     def send_YR(self, matrix: np.ndarray) -> bytes:
-        def validator(m):
-            if m.ndim != 2 or m.shape[1] != 1:
-                raise ValueError("YR必须为单列向量")
-
-        return self.send_matrix(0x0007, matrix, validator,
-                                lambda m: b''.join(struct.pack('<f', v) for v in m.flatten()))
+        return self.send_matrix(0x0007, matrix, lambda m: validate_matrix(0x0007, m),
+                                lambda m: pack_matrix(0x0007, m))
@@ -0,0 +1,139 @@
+import struct
+import numpy as np
+
+from backend.protocol.inLoop import (FrameParser, calc_checksum, decode_compact, CMD_SEGMENT, MATRIX_CMDS,
+                                     OP_SEGMENT_ACK, OP_SEGMENT_BEGIN, OP_SEGMENT_DONE, PACK_DTYPES,
+                                     SEGMENT_BEGIN_SEQ)
+
+
+class LocalDevice:
+    """
+    下位机本地替身（无硬件时的联调 / 回放目标）
+    - 接口与 serial.Serial 的常用子集一致：write / read / in_waiting / reset_input_buffer / close / with
+    - 解析收到的协议帧，按 matrix_id 保存矩阵，并记录启动 / 清除状态
+    - 支持分段传输：逐段确认，全部到齐后重组矩阵
+    - 支持紧凑编码：命令字高字节为编码类型
+    """
+
+    def __init__(self):
+        self._parser = FrameParser()
+        self._rx = bytearray()  # 待上位机读取的应答数据
+        self.matrix_id = 0
+        self.matrices = {}  # matrix_id -> {名称: ndarray}
+        self.running = {}  # matrix_id -> bool
+        self.frames_received = 0
+        self._segment = None  # 进行中的分段传输
+        self._completed = None  # 最近一次已完成的分段传输（用于应答重传的分段）
+        self.is_open = True
+
+    # ---- serial.Serial 兼容接口 ----
+    def write(self, data: bytes) -> int:
+        for cmd, ext_info, payload in self._parser.feed(data):
+            self.frames_received += 1
+            self.handle_frame(cmd, ext_info, payload)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        out = bytes(self._rx[:size])
+        del self._rx[:size]
+        return out
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx)
+
+    def reset_input_buffer(self):
+        """丢弃尚未被上位机读取的应答"""
+        self._rx.clear()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # ---- 协议处理 ----
+    @property
+    def dropped(self) -> int:
+        return self._parser.dropped
+
+    def reply(self, cmd: int, ext_info: int, data: bytes):
+        """追加一帧应答，供 read() 读取"""
+        header = struct.pack('>HHH', cmd, ext_info, len(data) + 2)
+        self._rx += header + data + struct.pack('>H', calc_checksum(header + data))
+
+    def handle_frame(self, cmd: int, ext_info: int, payload: bytes):
+        if cmd == 0x0000:
+            self._handle_control(ext_info & 0xFF, payload)
+        elif cmd == CMD_SEGMENT:
+            self._handle_segment(ext_info, payload)
+        elif cmd in MATRIX_CMDS:
+            self.matrices.setdefault(self.matrix_id, {})[MATRIX_CMDS[cmd]] = \
+                self._decode_matrix(cmd, ext_info, payload)
+        elif cmd & 0xFF in MATRIX_CMDS:  # 紧凑编码
+            self.matrices.setdefault(self.matrix_id, {})[MATRIX_CMDS[cmd & 0xFF]] = \
+                decode_compact(cmd & 0xFF, cmd >> 8, payload)
+
+    def _handle_control(self, operation_code: int, payload: bytes):
+        if operation_code == 0x01:  # 清除
+            self.matrices.pop(self.matrix_id, None)
+            self.running[self.matrix_id] = False
+        elif operation_code == 0x02:  # 启动
+            self.running[self.matrix_id] = True
+        elif operation_code == 0x03:  # 停止
+            self.running[self.matrix_id] = False
+        elif operation_code == 0x10:  # 指定 matrix_id
+            self.matrix_id, = struct.unpack('>I', payload)
+        elif operation_code == 0x20:  # 时延探测，原样回传
+            self.reply(0x0000, 0x21, payload)
+        elif operation_code == OP_SEGMENT_BEGIN:  # 分段传输开始
+            cmd, rows, cols, total, count, size = struct.unpack('>HHHIHH', payload)
+            self._completed = None
+            self._segment = {"cmd": cmd, "shape": (rows, cols), "count": count, "size": size,
+                             "buffer": bytearray(total), "received": set()}
+            self.reply(0x0000, OP_SEGMENT_ACK, struct.pack('>H', SEGMENT_BEGIN_SEQ))
+
+    def _handle_segment(self, seq: int, payload: bytes):
+        segment = self._segment
+        if segment is None:
+            completed = self._completed
+            if completed is not None and seq < completed["count"]:
+                # 上位机未收到应答而重传：重新确认，并再次告知重组已完成
+                self.reply(0x0000, OP_SEGMENT_ACK, struct.pack('>H', seq))
+                self.reply(0x0000, OP_SEGMENT_DONE, struct.pack('>H', completed["cmd"]))
+            return
+        if seq >= segment["count"]:
+            return
+        offset = seq * segment["size"]
+        segment["buffer"][offset:offset + len(payload)] = payload
+        segment["received"].add(seq)
+        self.reply(0x0000, OP_SEGMENT_ACK, struct.pack('>H', seq))
+        if len(segment["received"]) == segment["count"]:
+            cmd, encoding = segment["cmd"] & 0xFF, segment["cmd"] >> 8
+            data = bytes(segment["buffer"])
+            if encoding:
+                matrix = decode_compact(cmd, encoding, data)
+            else:
+                matrix = np.frombuffer(data, dtype=PACK_DTYPES.get(cmd, np.dtype('<f4'))).reshape(segment["shape"])
+            self.matrices.setdefault(self.matrix_id, {})[MATRIX_CMDS[cmd]] = matrix
+            self._segment = None
+            self._completed = segment
+            self.reply(0x0000, OP_SEGMENT_DONE, struct.pack('>H', segment["cmd"]))
+
+    @staticmethod
+    def _decode_matrix(cmd: int, ext_info: int, payload: bytes) -> np.ndarray:
+        if cmd == 0x0001:  # A：int8，拓展信息为列数
+            cols = ext_info
+            return np.frombuffer(payload, dtype=np.int8).reshape(-1, cols)
+        values = np.frombuffer(payload, dtype='<f4')
+        if cmd == 0x0002:  # G_inv：float32 方阵，拓展信息为维度
+            dim = ext_info & 0xFF
+            return values.reshape(dim, dim)
+        return values.reshape(-1, 1)  # 列向量
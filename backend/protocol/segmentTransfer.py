@@ -0,0 +1,114 @@
+import struct
+import time
+
+from backend.protocol.inLoop import FrameParser, OP_SEGMENT_ACK, OP_SEGMENT_DONE, SEGMENT_BEGIN_SEQ
+
+
+class SegmentTransferError(Exception):
+    pass
+
+
+class SegmentedTransfer:
+    """
+    分段传输的滑动窗口发送端（选择重传）
+    - 同时在途的分段不超过 window 个，收到确认即补发新分段，保持链路满载
+    - 超时未确认的分段单独重传，超过 retries 次判定失败
+    - 超时时间按波特率自动放宽，保证整窗数据能在超时内发送完毕
+    - 串口句柄常驻打开，开始前清空输入缓冲；只接受在途分段的确认与本次目标命令字的完成应答，
+      避免上一次传输残留的应答提前结束本次传输
+    """
+
+    def __init__(self, port, window: int = 8, timeout: float = 0.2, retries: int = 5,
+                 baud: int = 115200, on_write=None, on_read=None):
+        self.port = port
+        self.window = window
+        self.base_timeout = timeout
+        self.retries = retries
+        self.baud = baud
+        self.on_write = on_write  # 每次写入后的回调（用于抓包 / 统计）
+        self.on_read = on_read  # 每次读到应答数据后的回调（参数为原始字节块）
+        self._parser = FrameParser()
+        self.retransmits = 0
+
+    def _write(self, frame: bytes):
+        self.port.write(frame)
+        if self.on_write is not None:
+            self.on_write(frame)
+
+    def _poll(self) -> list:
+        """读取并解析当前可用的应答，返回 [(操作码, 数据), ...]"""
+        chunk = self.port.read(max(1, self.port.in_waiting))
+        if not chunk:
+            return []
+        if self.on_read is not None:
+            self.on_read(chunk)
+        return [(ext_info & 0xFF, data) for cmd, ext_info, data in self._parser.feed(chunk) if cmd == 0x0000]
+
+    @staticmethod
+    def _is_done(data: bytes, target_cmd: int) -> bool:
+        return len(data) == 2 and struct.unpack('>H', data)[0] == target_cmd
+
+    def run(self, begin: bytes, fragments: list) -> dict:
+        start = time.perf_counter()
+        count = len(fragments)
+        frame_time = max(len(f) for f in fragments) * 10 / self.baud if fragments else 0.0
+        timeout = self.base_timeout + self.window * frame_time
+        target_cmd, = struct.unpack_from('>H', begin, 6)
+        self.port.reset_input_buffer()
+
+        # 1. 开始帧（需确认）
+        self._send_until_acked(begin, SEGMENT_BEGIN_SEQ, timeout)
+
+        # 2. 滑动窗口发送分段
+        next_seq = 0
+        inflight = {}  # 序号 -> 发送时刻
+        attempts = [0] * count
+        acked = set()
+        done = False
+        while len(acked) < count:
+            while len(inflight) < self.window and next_seq < count:
+                self._write(fragments[next_seq])
+                inflight[next_seq] = time.perf_counter()
+                attempts[next_seq] += 1
+                next_seq += 1
+            for op, data in self._poll():
+                if op == OP_SEGMENT_ACK and len(data) == 2:
+                    seq, = struct.unpack('>H', data)
+                    if seq in inflight:  # 只接受已发出且尚未确认的分段
+                        acked.add(seq)
+                        del inflight[seq]
+                elif op == OP_SEGMENT_DONE and next_seq == count and self._is_done(data, target_cmd):
+                    done = True
+            if done:  # 下位机已重组完成：ACK 丢失的分段无需再重传
+                inflight.clear()
+                break
+            now = time.perf_counter()
+            for seq, sent_at in list(inflight.items()):
+                if now - sent_at > timeout:
+                    if attempts[seq] > self.retries:
+                        raise SegmentTransferError(f"分段 {seq} 重传 {self.retries} 次仍未确认")
+                    self._write(fragments[seq])
+                    inflight[seq] = now
+                    attempts[seq] += 1
+                    self.retransmits += 1
+
+        # 3. 等待下位机重组完成
+        deadline = time.perf_counter() + timeout
+        while not done and time.perf_counter() < deadline:
+            done = any(op == OP_SEGMENT_DONE and self._is_done(data, target_cmd) for op, data in self._poll())
+        if not done:
+            raise SegmentTransferError(f"命令字 0x{target_cmd:04X} 分段重组未完成")
+
+        elapsed = time.perf_counter() - start
+        sent = len(begin) + sum(len(f) * n for f, n in zip(fragments, attempts))
+        return {"fragments": count, "retransmits": self.retransmits, "bytes": sent, "elapsed": elapsed}
+
+    def _send_until_acked(self, frame: bytes, seq: int, timeout: float):
+        for _ in range(self.retries + 1):
+            self._write(frame)
+            deadline = time.perf_counter() + timeout
+            while time.perf_counter() < deadline:
+                for op, data in self._poll():
+                    if op == OP_SEGMENT_ACK and len(data) == 2 and struct.unpack('>H', data)[0] == seq:
+                        return
+        raise SegmentTransferError("分段传输开始帧未被确认")
@@ -1,7 +1,17 @@
 # routes/api_routes.py
-from flask import Blueprint, jsonify, request
+import time
+import numpy as np
+from flask import Blueprint, Response, jsonify, request, send_from_directory
+from backend.services.capture_service import capture_service
+from backend.services.device_service import DEFAULT_DEVICE, device_registry
 from backend.services.heartbeat_service import heartbeat_service
-from backend.services.serial_service import send_topology_data, setComPort
+from backend.services.metrics_service import metrics_service
+from backend.services.probe_service import probe_service
+from backend.services.profile_service import profile_service
+from backend.services.scheduler_service import scheduler_service
+from backend.services.topology_loader import MAX_UPLOAD_BYTES, load_topology
+from backend.services.waveform_service import waveform_service
+from backend.services.serial_service import build_topology_table, send_topology_data, setComPort
 
 api_bp = Blueprint('api', __name__)
 api_test = Blueprint('test', __name__)
@@ -34,6 +44,206 @@ def set_compots():
     return setComPort(port_name)
 
 
+@api_bp.route('/devices', methods=['GET'])
+def get_devices():
+    return jsonify([device.to_dict() for device in device_registry.list()])
+
+
+@api_bp.route('/devices', methods=['POST'])
+def add_device():
+    data = request.json
+    if not data.get('name'):
+        return jsonify({"status": "ERR", "reason": "缺少设备名"}), 400
+    try:
+        device = device_registry.add(data['name'], data.get('port'), data.get('baud', 115200),
+                                     data.get('groups', ()), data.get('matrix_id', 0), data.get('compact', False))
+    except ValueError as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    return jsonify({"status": "OK", "device": device.to_dict()})
+
+
+@api_bp.route('/devices/<name>', methods=['DELETE'])
+def remove_device(name):
+    try:
+        device_registry.remove(name)
+    except KeyError as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    return jsonify({"status": "OK"})
+
+
+@api_bp.route('/devices/upload', methods=['POST'])
+def upload_devices():
+    data = request.json
+    try:
+        devices = device_registry.resolve(data.get('devices'), data.get('group'))
+        topology_data = build_topology_table()[int(data['value'])][1]
+    except (KeyError, ValueError) as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    start = time.perf_counter()
+    try:
+        results = device_registry.upload([device.name for device in devices], topology_data,
+                                         partition=data.get('partition', False),
+                                         cut_branches=data.get('cut_branches', ()))
+    except ValueError as e:  # 拓扑拆分失败（如子网络导纳矩阵奇异、解耦支路未标记）
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    status = "OK" if all(result["status"] == "OK" for result in results.values()) else "ERR"
+    return jsonify({"status": status, "elapsed": time.perf_counter() - start, "results": results})
+
+
+@api_bp.route('/topology/upload', methods=['POST'])
+def upload_topology():
+    """
+    二进制拓扑上传：请求体为 .npy / .npz / 打包容器，流式解析后下发
+    查询参数：devices=a,b 或 group=xxx（缺省为默认设备）；name=单个 .npy 的矩阵名；
+             partition=1 拆分子网络；cut_branches=1,2
+    """
+    if request.content_length is None:  # 分块传输无法预先校验大小，要求客户端给出 Content-Length
+        return jsonify({"status": "ERR", "reason": "缺少请求体长度（Content-Length）"}), 411
+    if request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({"status": "ERR", "reason": f"请求体超过上传上限 {MAX_UPLOAD_BYTES} 字节"}), 413
+    names = [n for n in request.args.get('devices', '').split(',') if n]
+    try:
+        cut_branches = [int(j) for j in request.args.get('cut_branches', '').split(',') if j]
+        devices = device_registry.resolve(names or None, request.args.get('group')) \
+            if names or request.args.get('group') else [device_registry.get(DEFAULT_DEVICE)]
+        name = request.args.get('name')
+        base = devices[0].topology if name else None
+        topology = load_topology(request.stream, name=name, base=base)
+    except (KeyError, ValueError) as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    start = time.perf_counter()
+    try:
+        results = device_registry.upload([device.name for device in devices], topology,
+                                         partition=request.args.get('partition') == '1', cut_branches=cut_branches)
+    except ValueError as e:  # 拓扑拆分失败（如子网络导纳矩阵奇异、解耦支路未标记）
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    status = "OK" if all(result["status"] == "OK" for result in results.values()) else "ERR"
+    return jsonify({"status": status, "elapsed": time.perf_counter() - start, "results": results,
+                    "shapes": {key: list(np.shape(value)) for key, value in topology.items()}})
+
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_service.render(), mimetype='text/plain; version=0.0.4')
+
+
+@api_bp.route('/metrics', methods=['POST'])
+def set_metrics():
+    data = request.json
+    metrics_service.enabled = bool(data.get('enabled', metrics_service.enabled))
+    if data.get('reset'):
+        metrics_service.reset()
+    return jsonify({"status": "OK", "enabled": metrics_service.enabled})
+
+
+@api_bp.route('/probe', methods=['GET'])
+def get_probe():
+    return jsonify({"rate": probe_service.rate, "timeout": probe_service.timeout,
+                    "devices": probe_service.snapshot()})
+
+
+@api_bp.route('/probe', methods=['POST'])
+def set_probe():
+    data = request.json
+    probe_service.configure(rate=data.get('rate'), timeout=data.get('timeout'))
+    return jsonify({"status": "OK", "rate": probe_service.rate, "timeout": probe_service.timeout})
+
+
+@api_bp.route('/scheduler', methods=['GET'])
+def get_scheduler():
+    return jsonify({"async_mode": scheduler_service.async_mode, "tasks": scheduler_service.stats()})
+
+
+@api_bp.route('/profiles', methods=['GET'])
+def get_profiles():
+    return jsonify({"window": profile_service.window_remaining,
+                    "profiles": profile_service.list_profiles()})
+
+
+@api_bp.route('/profiles', methods=['POST'])
+def set_profiles():
+    data = request.json
+    profile_service.enable_window(data.get('seconds', 0))
+    return jsonify({"status": "OK", "window": profile_service.window_remaining})
+
+
+@api_bp.route('/profiles/<path:name>', methods=['GET'])
+def download_profile(name):
+    return send_from_directory(profile_service.profile_dir(), name, as_attachment=True)
+
+
+@api_bp.route('/capture', methods=['GET'])
+def get_capture():
+    return jsonify(capture_service.status())
+
+
+@api_bp.route('/capture', methods=['POST'])
+def set_capture():
+    data = request.json
+    if data.get('enabled'):
+        capture_service.start()
+    else:
+        capture_service.stop()
+    return jsonify({"status": "OK", **capture_service.status()})
+
+
+@api_bp.route('/waveforms', methods=['GET'])
+def get_waveforms():
+    return jsonify({"recording": waveform_service.meta if waveform_service.recording else None,
+                    "recordings": waveform_service.list_recordings()})
+
+
+@api_bp.route('/waveforms', methods=['POST'])
+def set_waveforms():
+    data = request.json
+    try:
+        if data.get('stop'):
+            waveform_service.stop()
+            return jsonify({"status": "OK"})
+        meta = waveform_service.start(data['name'], data['channels'], data['dt'], data.get('t0', 0.0))
+    except (KeyError, ValueError, RuntimeError) as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    return jsonify({"status": "OK", "recording": meta})
+
+
+@api_bp.route('/waveforms/samples', methods=['POST'])
+def append_waveform_samples():
+    """
+    向当前录制追加采样
+    - JSON：{通道名: [数值, ...]}，需包含全部通道且点数一致
+    - application/octet-stream：按 (n, 通道数) 行优先排列的 float32 小端数据
+    """
+    if not waveform_service.recording:
+        return jsonify({"status": "ERR", "reason": "当前没有进行中的录制"}), 400
+    try:
+        if request.is_json:
+            samples = request.json
+            if not isinstance(samples, dict):
+                raise ValueError("JSON 数据应为 {通道名: 数值列表}")
+        else:
+            width = len(waveform_service.meta['channels'])
+            data = request.get_data()
+            if len(data) % (4 * width):
+                raise ValueError(f"数据长度应为 {4 * width} 字节的整数倍")
+            samples = np.frombuffer(data, dtype='<f4').reshape(-1, width)
+        waveform_service.append(samples)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    return jsonify({"status": "OK"})
+
+
+@api_bp.route('/waveforms/<name>', methods=['GET'])
+def get_waveform(name):
+    try:
+        result = waveform_service.query(name, request.args['channel'],
+                                        start=request.args.get('start', type=float),
+                                        end=request.args.get('end', type=float),
+                                        points=request.args.get('points', 2000, type=int))
+    except (KeyError, ValueError, OSError) as e:
+        return jsonify({"status": "ERR", "reason": str(e)}), 400
+    return jsonify(result)
+
+
 @api_test.route('/set/topology', methods=['POST'])
 def set_topology():
     data = request.json
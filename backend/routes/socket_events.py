@@ -1,8 +1,17 @@
 from flask_socketio import SocketIO, disconnect
 from backend.services import heartbeat_service
+from backend.services.control_service import control_service
+from backend.services.device_service import DEFAULT_DEVICE
+from backend.services.metrics_service import metrics_service
+from backend.services.probe_service import probe_service
+from backend.services.scheduler_service import scheduler_service
+
+BROADCAST_INTERVAL = 1.0  # 状态推送周期（秒）
 
 
 def register_socket_events(socketio: SocketIO):
+    scheduler_service.bind(socketio)  # 调度器与 Socket.IO 异步模式保持一致
+
     @socketio.on('connect')
     def handle_connect(*args):
         """
@@ -11,7 +20,8 @@ def register_socket_events(socketio: SocketIO):
         """
         print('Client connected')
         heartbeat_service.start_heartbeat()  # 启动心跳自增
-        socketio.start_background_task(_send_heartbeat_data)
+        probe_service.start()  # 启动下位机时延探测
+        scheduler_service.add_periodic('broadcast', BROADCAST_INTERVAL, _send_heartbeat_data)
 
     @socketio.on('disconnect')
     def handle_disconnect(*args):
@@ -28,6 +38,8 @@ def register_socket_events(socketio: SocketIO):
 
         if active_clients <= 1:  # 当前断开的是最后一个连接时
             heartbeat_service.stop_heartbeat()
+            probe_service.stop()
+            scheduler_service.cancel('broadcast')
 
     @socketio.on('message')
     def handle_message(data):  # 无名字符串信息
@@ -41,10 +53,30 @@ def register_socket_events(socketio: SocketIO):
     def handle_my_custom_event(json):  # 自定义名称信息
         print('received json: ' + str(json))
 
+    @socketio.on('control_param')
+    def handle_control_param(data):
+        """
+        在线调节支路参数，返回值作为 ack 回传实际生效的值
+        :param data: {'device': 设备名(可选), 'matrix': 'YL'/'YC'/'YR'/'J', 'branch': 支路号, 'value': 数值}
+        """
+        return control_service.submit_param(data.get('device', DEFAULT_DEVICE), data.get('matrix'),
+                                            data.get('branch'), data.get('value'))
+
+    @socketio.on('control_topology')
+    def handle_control_topology(data):
+        """
+        整拓扑更新（覆盖此前未下发的参数更新）
+        :param data: {'device': 设备名(可选), 'value': 内置拓扑编号或 {矩阵名: 嵌套列表}}
+        """
+        return control_service.submit_topology(data.get('device', DEFAULT_DEVICE), data.get('value'))
+
+    def _timed_emit(event, data):
+        with metrics_service.timer('yorohil_socketio_emit_seconds', event=event):
+            socketio.emit(event, data)
+        metrics_service.inc('yorohil_socketio_emits_total', event=event)
+
     def _send_heartbeat_data():
-        while True:
-            # 发送 device_update（带自增值）
-            socketio.emit('device_update', {'value': heartbeat_service.value})
-            # 发送固定值 qaq
-            socketio.emit('qaq', {'value': 0})
-            socketio.sleep(1)  # 合并为每秒发送两个事件
+        # 发送 device_update：value 为各设备时延探测结果（主机心跳计数仍可通过 GET /api/device 读取）
+        _timed_emit('device_update', {'value': probe_service.snapshot()})
+        # 发送固定值 qaq
+        _timed_emit('qaq', {'value': 0})
@@ -1,2 +1,10 @@
 from .heartbeat_service import heartbeat_service
 from .serial_service import send_topology_data
+from .metrics_service import metrics_service
+from .profile_service import profile_service
+from .capture_service import capture_service
+from .waveform_service import waveform_service
+from .scheduler_service import scheduler_service
+from .probe_service import probe_service
+from .device_service import device_registry
+from .control_service import control_service
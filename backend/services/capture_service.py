@@ -0,0 +1,124 @@
+# services/capture_service.py
+import mmap
+import os
+import struct
+import time
+from threading import Lock
+
+from backend.sys.sysData import data_path
+
+CAPTURE_DIR = 'captures'
+FILE_MAGIC = b'YHCAP\x00\x01\x00'  # 文件头：魔数 + 版本
+RECORD_HEADER = struct.Struct('<QBI')  # 时间戳(ns) | 方向 | 帧长度
+
+DIR_OUT = 0  # 上位机 -> 下位机
+DIR_IN = 1  # 下位机 -> 上位机
+
+
+class CaptureService:
+    """
+    串口收发抓包（只追加二进制日志，可 mmap 读取）
+    文件格式：FILE_MAGIC + N × [RECORD_HEADER + 帧数据]
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._file = None
+        self.path = None
+        self.frames = 0
+        self.bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def start(self, path: str = None) -> str:
+        with self._lock:
+            if self._file is not None:
+                return self.path
+            if path is None:
+                path = data_path(CAPTURE_DIR, time.strftime('%Y%m%d-%H%M%S') + '.yhcap')
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            self._file = open(path, 'ab')
+            if new_file:
+                self._file.write(FILE_MAGIC)
+            self.path = path
+            self.frames = 0
+            self.bytes = 0
+            return path
+
+    def stop(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def record(self, direction: int, frames, timestamp_ns: int = None):
+        """记录一帧或多帧（同一时间戳），未开启抓包时直接返回"""
+        if self._file is None:
+            return
+        if isinstance(frames, (bytes, bytearray, memoryview)):
+            frames = (frames,)
+        ts = time.time_ns() if timestamp_ns is None else timestamp_ns
+        with self._lock:
+            if self._file is None:
+                return
+            for frame in frames:
+                self._file.write(RECORD_HEADER.pack(ts, direction, len(frame)))
+                self._file.write(frame)
+                self.frames += 1
+                self.bytes += len(frame)
+            self._file.flush()
+
+    def status(self) -> dict:
+        return {"enabled": self.enabled, "path": self.path, "frames": self.frames, "bytes": self.bytes}
+
+
+def iter_capture(path: str):
+    """
+    以 mmap 方式遍历抓包文件
+    :return: 生成 (timestamp_ns, direction, payload)，payload 为 bytes
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(FILE_MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(FILE_MAGIC)] != FILE_MAGIC:
+                raise ValueError("不是有效的抓包文件")
+            pos = len(FILE_MAGIC)
+            size = len(mm)
+            while pos + RECORD_HEADER.size <= size:
+                ts, direction, length = RECORD_HEADER.unpack_from(mm, pos)
+                pos += RECORD_HEADER.size
+                if pos + length > size:  # 写入中途截断的尾部记录
+                    break
+                yield ts, direction, mm[pos:pos + length]
+                pos += length
+
+
+def replay_capture(path: str, port, speed: float = 1.0, sleep=time.sleep) -> dict:
+    """
+    将抓包中的发送帧回放到串口或 LocalDevice
+    :param port: 具有 write() 的对象（serial.Serial / LocalDevice）
+    :param speed: 1.0 原速，>1 加速，0 或 None 为最快速度
+    """
+    frames = 0
+    sent = 0
+    first_ts = None
+    start = time.perf_counter()
+    for ts, direction, payload in iter_capture(path):
+        if direction != DIR_OUT:
+            continue
+        if speed:
+            if first_ts is None:
+                first_ts = ts
+            delay = (ts - first_ts) / 1e9 / speed - (time.perf_counter() - start)
+            if delay > 0:
+                sleep(delay)
+        port.write(payload)
+        frames += 1
+        sent += len(payload)
+    return {"frames": frames, "bytes": sent, "elapsed": time.perf_counter() - start}
+
+
+capture_service = CaptureService()
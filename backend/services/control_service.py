@@ -0,0 +1,207 @@
+# services/control_service.py
+import time
+from threading import Lock
+
+import numpy as np
+
+from backend.cirSim.netPartition import branch_admittance, compute_G_inv
+from backend.services.device_service import device_registry
+from backend.services.metrics_service import metrics_service
+from backend.services.scheduler_service import scheduler_service
+from backend.services.serial_service import build_topology_table, build_update_packets, write_packets
+from backend.services.topology_loader import validate_shape, validate_topology
+
+CONTROL_PARAMS = ("YL", "YC", "YR", "J")  # 可在线调节的支路参数
+ADMITTANCE_PARAMS = ("YL", "YC", "YR")  # 改变后需重算 G_inv 的参数
+FLUSH_INTERVAL = 0.02  # 同一设备两次下发的最小间隔（秒），期间到达的更新合并
+ACK_TIMEOUT = 10.0  # 等待下发结果的超时（秒）
+TOPOLOGY_KEY = ("topology",)
+
+metrics_service.describe('yorohil_control_updates_total', '收到的控制更新数')
+metrics_service.describe('yorohil_control_coalesced_total', '被同键后续更新覆盖（合并）的控制更新数')
+metrics_service.describe('yorohil_control_flush_seconds', '一次合并下发的耗时')
+
+
+class ControlRequest:
+    """单次控制更新及其确认结果"""
+    __slots__ = ('key', 'value', 'event', 'result')
+
+    def __init__(self, key: tuple, value):
+        self.key = key
+        self.value = value
+        self.event = scheduler_service.create_event()
+        self.result = None
+
+    def resolve(self, result: dict):
+        self.result = result
+        self.event.set()
+
+
+class ControlService:
+    """
+    低时延控制通道（Socket.IO 事件驱动）
+    - 每个设备一个下发协程；下发进行中或间隔未到时到达的更新按 (矩阵, 支路) 后写覆盖合并
+    - 参数更新只重发变化的列向量（导纳变化时连同重算的 G_inv），不做整表重载
+    - 每个请求都会收到实际生效的值；被合并的请求得到覆盖它的最新值
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = {}  # 设备名 -> {键: 最新请求}
+        self._waiters = {}  # 设备名 -> [等待确认的请求, ...]
+        self._flushing = set()
+
+    def submit_param(self, device_name: str, matrix: str, branch: int, value: float,
+                     timeout: float = ACK_TIMEOUT) -> dict:
+        """提交单个支路参数更新，阻塞当前协程直到下发完成，返回确认结果"""
+        if matrix not in CONTROL_PARAMS:
+            return {"status": "ERR", "reason": f"不支持在线调节的参数 {matrix}"}
+        try:
+            device_registry.get(device_name)
+            value = float(value)
+            branch = int(branch)
+        except (KeyError, TypeError, ValueError) as e:
+            return {"status": "ERR", "reason": str(e)}
+        return self._submit(device_name, ControlRequest((matrix, branch), value), timeout)
+
+    def submit_topology(self, device_name: str, value, timeout: float = ACK_TIMEOUT) -> dict:
+        """
+        提交整拓扑更新；value 为内置拓扑编号或 {矩阵名: 嵌套列表}
+        在此之前尚未下发的参数更新作废
+        """
+        try:
+            device_registry.get(device_name)
+            if isinstance(value, dict):
+                topology = {name: np.asarray(matrix) for name, matrix in value.items()}
+                for name, matrix in topology.items():
+                    validate_shape(name, matrix.shape, matrix.dtype)
+                topology = validate_topology(topology)
+            else:
+                table = build_topology_table()
+                if int(value) not in table:
+                    raise ValueError(f"内置拓扑 {value} 不存在")
+                topology = table[int(value)][1]
+        except (KeyError, TypeError, ValueError) as e:
+            return {"status": "ERR", "reason": str(e)}
+        return self._submit(device_name, ControlRequest(TOPOLOGY_KEY, topology), timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: len(pending) for name, pending in self._pending.items()}
+
+    def _submit(self, device_name: str, request: ControlRequest, timeout: float) -> dict:
+        metrics_service.inc('yorohil_control_updates_total', device=device_name)
+        superseded = []
+        with self._lock:
+            pending = self._pending.setdefault(device_name, {})
+            if request.key == TOPOLOGY_KEY:
+                superseded = [r for r in self._waiters.get(device_name, []) if r.key != TOPOLOGY_KEY]
+                self._waiters[device_name] = [r for r in self._waiters.get(device_name, [])
+                                              if r.key == TOPOLOGY_KEY]
+                pending.clear()
+            elif request.key in pending:
+                metrics_service.inc('yorohil_control_coalesced_total', device=device_name)
+            pending[request.key] = request
+            self._waiters.setdefault(device_name, []).append(request)
+            start = device_name not in self._flushing
+            self._flushing.add(device_name)
+        for r in superseded:
+            r.resolve({"status": "ERR", "reason": "已被后续拓扑更新覆盖"})
+        if start:
+            scheduler_service.spawn(self._flush_loop, device_name)
+        if not request.event.wait(timeout):
+            return {"status": "ERR", "reason": "等待下发超时"}
+        return request.result
+
+    def _flush_loop(self, device_name: str):
+        """逐批取出合并后的更新并下发，直到该设备没有待处理更新"""
+        try:
+            while True:
+                with self._lock:
+                    pending = self._pending.pop(device_name, None)
+                    waiters = self._waiters.pop(device_name, [])
+                    if not pending:
+                        self._flushing.discard(device_name)
+                        return
+                start = time.perf_counter()
+                try:
+                    results = self._flush(device_name, pending)
+                except Exception as e:  # 如下发期间设备被移除：本批全部以 ERR 确认，继续处理后续更新
+                    results = {key: {"status": "ERR", "reason": str(e)} for key in pending}
+                metrics_service.observe('yorohil_control_flush_seconds', time.perf_counter() - start,
+                                        device=device_name)
+                for request in waiters:
+                    result = dict(results.get(request.key, {"status": "ERR", "reason": "未得到下发结果"}))
+                    result["coalesced"] = pending.get(request.key) is not request
+                    request.resolve(result)
+                delay = FLUSH_INTERVAL - (time.perf_counter() - start)
+                if delay > 0:
+                    scheduler_service.sleep(delay)
+        finally:
+            # 异常退出时也要释放，否则该设备之后的更新不会再启动下发协程
+            with self._lock:
+                self._flushing.discard(device_name)
+
+    @staticmethod
+    def _flush(device_name: str, pending: dict) -> dict:
+        """下发一批已合并的更新，返回 {键: 结果}"""
+        results = {}
+        pending = dict(pending)
+        topology = pending.pop(TOPOLOGY_KEY, None)
+        if topology is not None:
+            result = device_registry.upload([device_name], topology.value)[device_name]
+            results[TOPOLOGY_KEY] = {**result, "device": device_name}
+            if result["status"] != "OK":
+                for key in pending:
+                    results[key] = {"status": "ERR", "reason": result["reason"]}
+                return results
+        if pending:
+            params = {key: request.value for key, request in pending.items()}
+            try:
+                device = device_registry.get(device_name)
+                applied = scheduler_service.run_blocking(_apply_params, device, params)
+            except Exception as e:
+                applied = {key: {"status": "ERR", "reason": str(e)} for key in params}
+            results.update(applied)
+        return results
+
+
+def _apply_params(device, params: dict) -> dict:
+    """将参数写入设备当前拓扑并增量下发（阻塞，运行于工作线程）"""
+    with device.lock:
+        if device.port is None:
+            raise RuntimeError("未配置串口")
+        if device.topology is None:
+            raise RuntimeError("设备尚未上传拓扑")
+        if device.subnetworks > 1:
+            raise RuntimeError("拆分子网络的设备不支持增量参数更新，请使用整拓扑更新")
+        topology = dict(device.topology)
+        n_branch = np.asarray(topology["A"]).shape[1]
+        results = {}
+        updates = {}
+        for (matrix, branch), value in params.items():
+            if not 0 <= branch < n_branch:
+                results[(matrix, branch)] = {"status": "ERR", "reason": f"支路 {branch} 超出范围"}
+                continue
+            if matrix not in updates:
+                current = topology.get(matrix, np.zeros((n_branch, 1)))
+                updates[matrix] = np.array(current, dtype=float).reshape(-1, 1)
+            updates[matrix][branch, 0] = value
+        if updates:
+            topology.update(updates)
+            if "G_inv" in topology and any(key in updates for key in ADMITTANCE_PARAMS):
+                topology["G_inv"] = updates["G_inv"] = compute_G_inv(topology["A"], branch_admittance(topology))
+            packets = build_update_packets(updates, device.matrix_id, device.compact)
+            write_packets(device.port, packets, device.baud)
+            device.topology = topology
+        for matrix, branch in params:
+            if (matrix, branch) not in results:
+                results[(matrix, branch)] = {
+                    "status": "OK", "device": device.name, "matrix": matrix, "branch": branch,
+                    # 下位机以 float32 保存，回传实际生效的值
+                    "value": float(np.float32(updates[matrix][branch, 0])),
+                }
+        return results
+
+
+control_service = ControlService()
@@ -0,0 +1,169 @@
+# services/device_service.py
+import time
+from threading import Lock
+
+from backend.cirSim.netPartition import partition_topology
+from backend.services.metrics_service import metrics_service
+from backend.services.probe_service import probe_service
+from backend.services.profile_service import profile_service
+from backend.services.scheduler_service import scheduler_service
+from backend.services.serial_service import (COM_PORT, BAUD_RATE, LOCAL_PORT, build_packets, build_release_packets,
+                                             close_port, open_port, write_packets)
+
+DEFAULT_DEVICE = 'default'  # 兼容单板接口（/api/compots、/api/test/set/topology）的默认设备
+
+
+class Device:
+    """单块下位机：独立的串口、工作线程与状态"""
+
+    def __init__(self, name: str, port: str = None, baud: int = BAUD_RATE, groups=(), matrix_id: int = 0,
+                 compact: bool = False):
+        self.name = name
+        self.port = port
+        self.baud = baud
+        self.groups = set(groups)
+        self.matrix_id = matrix_id
+        self.compact = compact  # 固件是否支持紧凑编码
+        self.state = 'idle'  # idle / uploading / ok / error
+        self.last_error = None
+        self.last_upload = None  # 最近一次上传耗时（秒）
+        self.topology = None  # 最近一次成功上传的拓扑数据
+        self.subnetworks = 1  # 拓扑拆分后占用的 matrix_id 个数
+        self.lock = Lock()  # 同一设备的上传串行执行
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "port": self.port,
+            "baud": self.baud,
+            "groups": sorted(self.groups),
+            "matrix_id": self.matrix_id,
+            "compact": self.compact,
+            "state": self.state,
+            "last_error": self.last_error,
+            "last_upload": self.last_upload,
+            "subnetworks": self.subnetworks,
+        }
+
+
+class DeviceRegistry:
+    """
+    多板设备注册表
+    - 每块板卡独立串口与状态，不同板卡的上传在工作线程中并行执行
+    - 可按设备名列表或分组批量下发同一拓扑
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._devices = {}
+
+    def add(self, name: str, port: str = None, baud: int = BAUD_RATE, groups=(), matrix_id: int = 0,
+            compact: bool = False) -> Device:
+        with self._lock:
+            if port is not None and port != LOCAL_PORT:
+                for other in self._devices.values():
+                    if other.name != name and other.port == port and other.baud != baud:
+                        raise ValueError(f"串口 {port} 已被设备 {other.name} 以波特率 {other.baud} 使用")
+            old = self._devices.get(name)
+            device = Device(name, port, baud, groups, matrix_id, compact)
+            if old is not None:
+                device.topology = old.topology
+            self._devices[name] = device
+        # 更换串口或波特率时关闭旧句柄，下次使用时按新参数重新打开
+        if old is not None and old.port is not None and (old.port != port or old.baud != baud):
+            close_port(old.port)
+        return device
+
+    def remove(self, name: str):
+        with self._lock:
+            device = self._devices.pop(name, None)
+        if device is None:
+            raise KeyError(f"设备 {name} 不存在")
+        if device.port is not None:
+            close_port(device.port)
+
+    def get(self, name: str) -> Device:
+        with self._lock:
+            device = self._devices.get(name)
+        if device is None:
+            raise KeyError(f"设备 {name} 不存在")
+        return device
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self._devices.values())
+
+    def resolve(self, names=None, group: str = None) -> list:
+        """按设备名列表或分组选出设备；均未指定时返回全部设备"""
+        if names:
+            return [self.get(name) for name in names]
+        devices = self.list()
+        if group is not None:
+            devices = [device for device in devices if group in device.groups]
+            if not devices:
+                raise KeyError(f"分组 {group} 中没有设备")
+        return devices
+
+    def set_port(self, name: str, port: str):
+        device = self.get(name)
+        if device.port != port and device.port is not None:
+            close_port(device.port)
+        device.port = port
+        scheduler_service.run_blocking(open_port, port, device.baud)
+
+    def upload(self, names, topology_data: dict, partition: bool = False, cut_branches=()) -> dict:
+        """
+        向多块板卡并行上传同一拓扑，返回 {设备名: 结果}
+        partition=True 时先拆分为互不耦合的子网络，依次装载到 matrix_id, matrix_id+1, ...
+        拆分失败（子网络导纳矩阵奇异、cut_branches 未标记为传输线）时抛出 ValueError
+        """
+        devices = [self.get(name) for name in names]
+        report = None
+        if partition:
+            subnetworks, report = partition_topology(topology_data, cut_branches)
+        else:
+            subnetworks = [topology_data]
+        task = profile_service.wrap_task(self._upload_one)
+        results = scheduler_service.run_parallel(
+            [(task, (device, topology_data, subnetworks)) for device in devices])
+        if report is not None:
+            for result in results:
+                result["partition"] = report
+        return {device.name: result for device, result in zip(devices, results)}
+
+    @staticmethod
+    def _upload_one(device: Device, topology_data: dict, subnetworks: list) -> dict:
+        """单块板卡的完整上传（阻塞，运行于工作线程）"""
+        if device.port is None:
+            device.state = 'error'
+            device.last_error = "未配置串口"
+            return {"status": "ERR", "reason": device.last_error}
+        with device.lock:
+            device.state = 'uploading'
+            start = time.perf_counter()
+            try:
+                with metrics_service.timer('yorohil_upload_seconds', device=device.name):
+                    packets = []
+                    # 上次拆分出的子网络多于本次时，先停止并清除不再使用的 matrix_id，避免旧拓扑继续运行
+                    for offset in range(len(subnetworks), device.subnetworks):
+                        packets += build_release_packets(device.matrix_id + offset)
+                    for offset, sub in enumerate(subnetworks):
+                        packets += build_packets(sub, device.matrix_id + offset, device.compact)
+                    write_packets(device.port, packets, device.baud)
+            except Exception as e:
+                device.state = 'error'
+                device.last_error = str(e)
+                return {"status": "ERR", "reason": device.last_error}
+            device.last_upload = time.perf_counter() - start
+            device.state = 'ok'
+            device.last_error = None
+            device.topology = topology_data
+            device.subnetworks = len(subnetworks)
+        return {"status": "OK", "elapsed": device.last_upload}
+
+
+device_registry = DeviceRegistry()
+device_registry.add(DEFAULT_DEVICE, COM_PORT)
+
+# 时延探测覆盖所有已配置串口的设备
+probe_service.targets = lambda: {device.name: (device.port, device.baud) for device in device_registry.list()}
@@ -1,14 +1,15 @@
 # services/heartbeat_service.py
-from threading import Lock, Event, Thread
-from time import sleep
+from threading import Lock
+
+from backend.services.scheduler_service import scheduler_service
+
+HEARTBEAT_INTERVAL = 1.0  # 原始逻辑中的自增间隔（秒）
 
 
 class HeartbeatService:
     def __init__(self):
         self._heartbeat_value = 0
         self._lock = Lock()
-        self._heartbeat_active = Event()  # 心跳控制开关
-        self._heartbeat_thread = None
 
     @property
     def value(self):
@@ -26,20 +27,11 @@ class HeartbeatService:
             return self._heartbeat_value
 
     def start_heartbeat(self):
-        if not self._heartbeat_active.is_set():
-            self._heartbeat_active.set()
-            self._heartbeat_thread = Thread(target=self._run_heartbeat)
-            self._heartbeat_thread.start()
+        # 由统一调度器按周期执行，重复调用不会产生多个任务
+        scheduler_service.add_periodic('heartbeat', HEARTBEAT_INTERVAL, self.increment_value)
 
     def stop_heartbeat(self):
-        self._heartbeat_active.clear()
-        if self._heartbeat_thread:
-            self._heartbeat_thread.join()
-
-    def _run_heartbeat(self):
-        while self._heartbeat_active.is_set():
-            self.increment_value()
-            sleep(1)  # 原始逻辑中的自增间隔
+        scheduler_service.cancel('heartbeat')
 
 
 heartbeat_service = HeartbeatService()
@@ -0,0 +1,163 @@
+# services/metrics_service.py
+import os
+from bisect import bisect_left
+from contextlib import nullcontext
+from threading import Lock
+from time import perf_counter
+
+# 默认直方图分桶（秒），覆盖 10us ~ 10s
+DEFAULT_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+_NULL_TIMER = nullcontext()  # 关闭时复用的空计时器，不产生任何分配
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label(value) -> str:
+    """按 Prometheus 文本格式转义标签值（反斜杠、双引号、换行）"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in items) + '}'
+
+
+def _format_value(v) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    """计时上下文，退出时将耗时写入直方图"""
+    __slots__ = ('_service', '_name', '_labels', '_start')
+
+    def __init__(self, service, name, labels):
+        self._service = service
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._service.observe(self._name, perf_counter() - self._start, **self._labels)
+        return False
+
+
+class MetricsService:
+    """
+    轻量指标采集（计数器 / 仪表 / 直方图），输出 Prometheus 文本格式
+    - enabled=False 时所有采集调用直接返回，计时器为共享空上下文
+    - 环境变量 YOROHIL_METRICS=0 可在启动时关闭
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get('YOROHIL_METRICS', '1') != '0'
+        self._lock = Lock()
+        self._help = {}
+        self._counters = {}  # name -> {label_key: value}
+        self._gauges = {}
+        self._histograms = {}  # name -> {label_key: _Histogram}
+        self._buckets = {}
+
+    def describe(self, name: str, help_text: str, buckets=None):
+        """登记指标说明（及直方图分桶）"""
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            hist.observe(value)
+
+    def timer(self, name: str, **labels):
+        """with metrics_service.timer('xxx_seconds', stage='yyy'): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        with self._lock:
+            for kind, store in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(store.items()):
+                    if name in self._help:
+                        lines.append(f'# HELP {name} {self._help[name]}')
+                    lines.append(f'# TYPE {name} {kind}')
+                    for key, value in series.items():
+                        lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} histogram')
+                for key, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets + (float('inf'),), hist.counts):
+                        cumulative += count
+                        le = (('le', _format_value(bound)),)
+                        lines.append(f'{name}_bucket{_format_labels(key, le)} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {_format_value(hist.sum)}')
+                    lines.append(f'{name}_count{_format_labels(key)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics_service = MetricsService()
+
+# 上传链路与推送循环的指标说明
+metrics_service.describe('yorohil_upload_stage_seconds',
+                         '拓扑上传各阶段耗时（build/encode/checksum/open/write/segmented）')
+metrics_service.describe('yorohil_upload_seconds', '拓扑上传总耗时')
+metrics_service.describe('yorohil_serial_bytes_sent_total', '串口累计发送字节数')
+metrics_service.describe('yorohil_frames_sent_total', '按命令字统计的已发送帧数')
+metrics_service.describe('yorohil_serial_queue_depth', '最近一次上传待写入串口的帧数')
+metrics_service.describe('yorohil_segment_retransmits_total', '分段传输重传的分段数')
+metrics_service.describe('yorohil_socketio_emit_seconds', 'Socket.IO 单次 emit 耗时')
+metrics_service.describe('yorohil_socketio_emits_total', 'Socket.IO 累计 emit 次数')
@@ -0,0 +1,150 @@
+# services/probe_service.py
+import os
+import struct
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+from backend.protocol.inLoop import FrameParser, MatrixSender
+from backend.services.capture_service import capture_service, DIR_IN, DIR_OUT
+from backend.services.metrics_service import metrics_service
+from backend.services.scheduler_service import scheduler_service
+
+PROBE_RATE = float(os.environ.get('YOROHIL_PROBE_HZ', 1.0))  # 探测频率（Hz）
+PROBE_TIMEOUT = 0.5  # 单次应答超时（秒）
+PROBE_WINDOW = 600  # 滚动窗口保留的探测次数
+
+# 往返时延直方图分桶（秒），覆盖 100us ~ 1s
+RTT_BUCKETS = (1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0)
+
+metrics_service.describe('yorohil_device_rtt_seconds', '下位机 ping/echo 往返时延', buckets=RTT_BUCKETS)
+metrics_service.describe('yorohil_device_probes_total', '下位机探测次数（result=ok/lost）')
+
+
+class RollingLatency:
+    """单设备的滚动往返时延统计，丢包以 None 记录"""
+
+    def __init__(self, window: int = PROBE_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.sent = 0
+        self.received = 0
+        self.last_ok = None  # 最近一次收到应答的时间戳
+        self.last_error = None
+
+    def add(self, rtt):
+        self.samples.append(rtt)
+        self.sent += 1
+        if rtt is not None:
+            self.received += 1
+            self.last_ok = time.time()
+
+    def snapshot(self, interval: float) -> dict:
+        window = list(self.samples)
+        rtts = np.array([r for r in window if r is not None])
+        result = {
+            "alive": self.last_ok is not None and time.time() - self.last_ok < 3 * max(interval, PROBE_TIMEOUT),
+            "sent": self.sent,
+            "received": self.received,
+            "loss": (len(window) - len(rtts)) / len(window) if window else 0.0,
+            "last_error": self.last_error,
+            "buckets": list(RTT_BUCKETS),
+            "histogram": np.histogram(rtts, bins=(0.0,) + RTT_BUCKETS + (np.inf,))[0].tolist(),
+        }
+        if len(rtts):
+            p50, p90, p99 = np.percentile(rtts, [50, 90, 99])
+            result.update({"rtt_min": float(rtts.min()), "rtt_max": float(rtts.max()),
+                           "rtt_mean": float(rtts.mean()), "rtt_p50": float(p50),
+                           "rtt_p90": float(p90), "rtt_p99": float(p99)})
+        return result
+
+
+class ProbeService:
+    """
+    下位机往返时延探测：按设定频率发送 ping 帧（0x0000 操作码0x20），等待 0x21 回传
+    每台设备维护滚动时延直方图与丢包率
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}  # 设备名 -> RollingLatency
+        self._seq = 0
+        self.rate = PROBE_RATE
+        self.timeout = PROBE_TIMEOUT
+        self.targets = lambda: {}  # 返回 {设备名: (端口名, 波特率)}，由设备注册表注入
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate if self.rate > 0 else 0.0
+
+    def configure(self, rate: float = None, timeout: float = None):
+        if timeout is not None:
+            self.timeout = float(timeout)
+        if rate is not None:
+            self.rate = float(rate)
+            if scheduler_service.is_running('probe'):
+                self.stop()
+                self.start()
+
+    def start(self):
+        if self.rate > 0:
+            scheduler_service.add_periodic('probe', self.interval, self._tick)
+
+    def stop(self):
+        scheduler_service.cancel('probe')
+
+    def _tick(self):
+        # 各设备并行探测，避免无应答的板卡（每块最长阻塞 timeout）累加拖慢整个节拍
+        targets = [(name, port_name, baud) for name, (port_name, baud) in self.targets().items()
+                   if port_name is not None]
+        if not targets:
+            return
+        rtts = scheduler_service.run_parallel([(self._probe_once, target) for target in targets])
+        for (name, _, _), rtt in zip(targets, rtts):
+            result = 'lost' if rtt is None else 'ok'
+            metrics_service.inc('yorohil_device_probes_total', device=name, result=result)
+            if rtt is not None:
+                metrics_service.observe('yorohil_device_rtt_seconds', rtt, device=name)
+
+    def _probe_once(self, name: str, port_name: str, baud: int = None):
+        """发送一次 ping 并等待回传（阻塞，运行于工作线程），超时返回 None"""
+        from backend.services.serial_service import acquire_port
+
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+            seq = self._seq
+            stats = self._stats.setdefault(name, RollingLatency())
+        frame = MatrixSender().send_ping(seq)
+        parser = FrameParser()
+        rtt = None
+        try:
+            with acquire_port(port_name, baud) as ser:
+                start = time.perf_counter()
+                ser.write(frame)
+                capture_service.record(DIR_OUT, frame)
+                deadline = start + self.timeout
+                while rtt is None and time.perf_counter() < deadline:
+                    chunk = ser.read(max(1, ser.in_waiting))
+                    if not chunk:
+                        continue
+                    capture_service.record(DIR_IN, chunk)
+                    for cmd, ext_info, data in parser.feed(chunk):
+                        if cmd == 0x0000 and ext_info & 0xFF == 0x21 and data == struct.pack('>I', seq):
+                            rtt = time.perf_counter() - start
+            stats.last_error = None
+        except Exception as e:
+            stats.last_error = str(e)
+        with self._lock:
+            stats.add(rtt)
+        return rtt
+
+    def snapshot(self, name: str = None) -> dict:
+        with self._lock:
+            if name is not None:
+                stats = self._stats.get(name)
+                return stats.snapshot(self.interval) if stats else {}
+            return {key: stats.snapshot(self.interval) for key, stats in self._stats.items()}
+
+
+probe_service = ProbeService()
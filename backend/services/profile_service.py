@@ -0,0 +1,148 @@
+# services/profile_service.py
+import cProfile
+import os
+import time
+from functools import wraps
+from threading import Lock
+
+from flask import g, has_request_context, request
+
+from backend.sys.sysData import data_path
+
+PROFILE_DIR = 'profiles'
+MAX_PROFILES = int(os.environ.get('YOROHIL_PROFILE_KEEP', 50))  # 最多保留的剖析文件数
+
+
+class ProfileService:
+    """
+    按需请求剖析（cProfile）
+    - 单次请求：查询参数 ?profile=1 或请求头 X-Profile: 1
+    - 时间窗口：enable_window(seconds) 期间所有 /api 请求均剖析
+    - 结果保存为 pstats 文件（.prof），可用 snakeviz / speedscope 等离线查看火焰图
+    注：cProfile 按系统线程采集，eventlet 下同一线程内其他协程的调用也会计入
+    """
+
+    def __init__(self):
+        self._window_until = 0.0
+        self._busy = Lock()  # 同一时刻只允许一个剖析器运行
+        self._lock = Lock()
+        self._info = {}  # 文件名 -> 本次运行中保存的剖析的附加信息（耗时、请求方法与路径）
+
+    @property
+    def window_remaining(self) -> float:
+        return max(0.0, self._window_until - time.time())
+
+    def enable_window(self, seconds: float):
+        self._window_until = time.time() + max(0.0, float(seconds))
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _wanted(self) -> bool:
+        if not request.path.startswith('/api/') or request.path.startswith('/api/profiles'):
+            return False
+        if request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1':
+            return True
+        return time.time() < self._window_until
+
+    def _before_request(self):
+        if not self._wanted() or not self._busy.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # 已有其他剖析工具在运行
+            self._busy.release()
+            return
+        g.profile_id = self._new_id(request.endpoint or 'unknown')
+        g.profiler = profiler
+        g.profile_start = time.perf_counter()
+
+    def _after_request(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        self._busy.release()
+        profile_id = g.profile_id
+        self._save(profile_id, profiler, time.perf_counter() - g.profile_start,
+                   method=request.method, path=request.path)
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def _teardown_request(self, exc):
+        # 视图抛出未处理异常时不会经过 after_request，这里兜底释放剖析器
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._busy.release()
+
+    def wrap_task(self, func):
+        """包装请求中启动的后台任务，使其在被剖析的请求下单独生成剖析文件"""
+        if not has_request_context() or 'profiler' not in g:
+            return func
+        parent_id = g.profile_id
+        path = request.path
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self._save(f'{parent_id}_task_{func.__name__}', profiler, time.perf_counter() - start,
+                           method='TASK', path=path, parent=parent_id)
+
+        return wrapper
+
+    def _new_id(self, name: str) -> str:
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+        return f'{stamp}-{int(now * 1e6) % 1000000:06d}_{name.replace(".", "-")}'
+
+    def _save(self, profile_id: str, profiler: cProfile.Profile, duration: float, **info):
+        filename = f'{profile_id}.prof'
+        profiler.dump_stats(data_path(PROFILE_DIR, filename))
+        with self._lock:
+            self._info[filename] = {"duration": duration, **info}
+            # 以目录为准淘汰最旧的文件（包括之前运行留下的）
+            files = self._scan()
+            expired = files[:-MAX_PROFILES] if MAX_PROFILES > 0 else files
+            for name, _ in expired:
+                self._info.pop(name, None)
+                try:
+                    os.remove(os.path.join(self.profile_dir(), name))
+                except OSError:
+                    pass
+
+    def _scan(self) -> list:
+        """目录中的剖析文件 [(文件名, 修改时间), ...]，按时间从旧到新"""
+        root = self.profile_dir()
+        files = []
+        for name in os.listdir(root):
+            if name.endswith('.prof'):
+                try:
+                    files.append((name, os.path.getmtime(os.path.join(root, name))))
+                except OSError:
+                    pass  # 扫描期间被删除
+        return sorted(files, key=lambda item: (item[1], item[0]))
+
+    def list_profiles(self) -> list:
+        """以剖析目录为索引（重启后仍可列出），时间戳取文件修改时间"""
+        with self._lock:
+            return [{"name": name, "timestamp": mtime, **self._info.get(name, {})}
+                    for name, mtime in self._scan()]
+
+    def profile_dir(self) -> str:
+        return os.path.dirname(data_path(PROFILE_DIR, 'x'))
+
+
+profile_service = ProfileService()
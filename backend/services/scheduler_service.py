@@ -0,0 +1,180 @@
+# services/scheduler_service.py
+import time
+from threading import Event, Lock, Thread
+
+from backend.services.metrics_service import metrics_service
+
+# 抖动直方图分桶（秒），覆盖 10us ~ 1s
+JITTER_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.5, 1.0)
+
+metrics_service.describe('yorohil_scheduler_jitter_seconds', '周期任务实际唤醒时刻与计划时刻之差',
+                         buckets=JITTER_BUCKETS)
+metrics_service.describe('yorohil_scheduler_run_seconds', '周期任务单次执行耗时')
+metrics_service.describe('yorohil_scheduler_overruns_total', '周期任务执行超过周期（跳拍）次数')
+
+
+class PeriodicTask:
+    """周期任务及其节拍统计"""
+
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.active = True
+        self.ticks = 0
+        self.overruns = 0
+        self.errors = 0
+        self.jitter_last = 0.0
+        self.jitter_max = 0.0
+        self.jitter_sum = 0.0
+        self.run_max = 0.0
+        self.run_sum = 0.0
+
+    def stats(self) -> dict:
+        ticks = max(self.ticks, 1)
+        return {
+            "interval": self.interval,
+            "active": self.active,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "jitter_last": self.jitter_last,
+            "jitter_max": self.jitter_max,
+            "jitter_mean": self.jitter_sum / ticks,
+            "run_max": self.run_max,
+            "run_mean": self.run_sum / ticks,
+        }
+
+
+class SchedulerService:
+    """
+    统一调度器（与 Socket.IO 异步模式一致）
+    - 周期任务以协程方式运行，按绝对节拍补偿漂移，记录抖动与超时跳拍
+    - run_blocking() 将阻塞调用（串口读写）移到工作线程池，不阻塞 eventlet / gevent 主循环
+    - bind() 之前（如脚本调用）退化为普通守护线程与 time.sleep
+    """
+
+    def __init__(self):
+        self._socketio = None
+        self._lock = Lock()
+        self._tasks = {}
+
+    def bind(self, socketio):
+        self._socketio = socketio
+
+    @property
+    def async_mode(self) -> str:
+        return self._socketio.async_mode if self._socketio is not None else 'threading'
+
+    def sleep(self, seconds: float):
+        if self._socketio is not None:
+            self._socketio.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def spawn(self, func, *args, **kwargs):
+        if self._socketio is not None:
+            return self._socketio.start_background_task(func, *args, **kwargs)
+        thread = Thread(target=func, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def create_event(self):
+        """创建与当前异步模式匹配的事件对象（set / wait(timeout) / is_set）"""
+        if self._socketio is not None:
+            return self._socketio.server.eio.create_event()
+        return Event()
+
+    def run_blocking(self, func, *args, **kwargs):
+        """在工作线程中执行阻塞调用，当前协程等待结果期间让出主循环"""
+        mode = self.async_mode
+        if mode == 'eventlet':
+            from eventlet import tpool
+            return tpool.execute(func, *args, **kwargs)
+        if mode == 'gevent':
+            import gevent
+            return gevent.get_hub().threadpool.apply(func, args, kwargs)
+        return func(*args, **kwargs)
+
+    def run_parallel(self, calls: list) -> list:
+        """
+        并行执行多个阻塞调用并等待全部完成，结果按输入顺序返回
+        :param calls: [(func, args), ...]
+        """
+        mode = self.async_mode
+        if mode == 'eventlet':
+            from eventlet import GreenPool, tpool
+            pool = GreenPool(max(len(calls), 1))
+            return list(pool.imap(lambda call: tpool.execute(call[0], *call[1]), calls))
+        if mode == 'gevent':
+            import gevent
+            pool = gevent.get_hub().threadpool
+            jobs = [pool.spawn(func, *args) for func, args in calls]
+            gevent.joinall(jobs)
+            return [job.get() for job in jobs]
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(len(calls), 1)) as executor:
+            return list(executor.map(lambda call: call[0](*call[1]), calls))
+
+    def add_periodic(self, name: str, interval: float, func) -> PeriodicTask:
+        """注册周期任务；同名任务已在运行时直接返回该任务"""
+        with self._lock:
+            task = self._tasks.get(name)
+            if task is not None and task.active:
+                return task
+            task = PeriodicTask(name, interval, func)
+            self._tasks[name] = task
+        self.spawn(self._run_periodic, task)
+        return task
+
+    def cancel(self, name: str):
+        with self._lock:
+            task = self._tasks.get(name)
+            if task is not None:
+                task.active = False
+
+    def is_running(self, name: str) -> bool:
+        task = self._tasks.get(name)
+        return task is not None and task.active
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: task.stats() for name, task in self._tasks.items()}
+
+    def _run_periodic(self, task: PeriodicTask):
+        next_tick = time.perf_counter() + task.interval
+        while task.active:
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self.sleep(delay)
+            if not task.active:
+                break
+            start = time.perf_counter()
+            jitter = start - next_tick
+            try:
+                task.func()
+            except Exception as e:
+                task.errors += 1
+                print(f"周期任务 {task.name} 异常: {e}")
+            run = time.perf_counter() - start
+
+            task.ticks += 1
+            task.jitter_last = jitter
+            task.jitter_max = max(task.jitter_max, jitter)
+            task.jitter_sum += jitter
+            task.run_max = max(task.run_max, run)
+            task.run_sum += run
+            metrics_service.observe('yorohil_scheduler_jitter_seconds', jitter, task=task.name)
+            metrics_service.observe('yorohil_scheduler_run_seconds', run, task=task.name)
+
+            # 按绝对节拍推进；执行超时则跳过错过的节拍
+            next_tick += task.interval
+            now = time.perf_counter()
+            if now > next_tick:
+                missed = int((now - next_tick) // task.interval) + 1
+                task.overruns += missed
+                metrics_service.inc('yorohil_scheduler_overruns_total', missed, task=task.name)
+                next_tick += missed * task.interval
+
+
+scheduler_service = SchedulerService()
@@ -1,28 +1,90 @@
 import serial
+import struct
+import time
 import numpy as np
+from contextlib import contextmanager
+from threading import Lock
 from flask import jsonify
 
-from backend.protocol.inLoop import MatrixSender
+from backend.protocol.inLoop import MatrixSender, MATRIX_CMDS, MATRIX_NAMES, needs_segmentation
+from backend.protocol.localDevice import LocalDevice
+from backend.protocol.segmentTransfer import SegmentedTransfer
+from backend.services.capture_service import capture_service, DIR_IN, DIR_OUT
+from backend.services.metrics_service import metrics_service
 import serial.tools.list_ports
 
 # 获取所有串口设备列表
 ports = serial.tools.list_ports.comports()
 
-# 判断列表是否非空，避免 IndexError
+# 判断列表是否非空，避免 IndexError（作为默认设备的初始串口）
 if ports:
-    # 直接访问第一个设备的 description 属性
-    COM_PORT = ports[0].description
+    # 使用第一个设备的设备路径（description 仅为显示名称，无法用于打开串口）
+    COM_PORT = ports[0].device
 else:
     COM_PORT = None
 
 BAUD_RATE = 115200  # 波特率
+READ_TIMEOUT = 0.05  # 读超时（秒），决定应答轮询粒度
+LOCAL_PORT = 'local'  # 使用本地下位机替身代替真实串口
+SEGMENT_WINDOW = 8  # 分段传输窗口（在途分段数）
 
+_ports = {}  # 端口名 -> [串口对象, 端口锁, 打开时的波特率]
+_ports_lock = Lock()
+
+
+@contextmanager
+def acquire_port(port_name, baud: int = None):
+    """
+    独占使用常驻打开的串口（阻塞，应在工作线程中调用）
+    首次使用时打开；发生串口异常时关闭，下次使用时重新打开
+    同一串口已以其他波特率打开时拒绝使用（需先 close_port）
+    """
+    with _ports_lock:
+        entry = _ports.setdefault(port_name, [None, Lock(), None])
+    with entry[1]:
+        if entry[0] is None or not entry[0].is_open:
+            with metrics_service.timer('yorohil_upload_stage_seconds', stage='open'):
+                if port_name == LOCAL_PORT:
+                    entry[0] = LocalDevice()
+                else:
+                    entry[0] = serial.Serial(port_name, baud or BAUD_RATE, timeout=READ_TIMEOUT)
+                entry[2] = baud or BAUD_RATE
+        elif baud is not None and baud != entry[2] and port_name != LOCAL_PORT:
+            raise ValueError(f"串口 {port_name} 已以波特率 {entry[2]} 打开，不能以 {baud} 使用")
+        try:
+            yield entry[0]
+        except (serial.SerialException, OSError):
+            entry[0].close()
+            entry[0] = None
+            raise
+
+
+def close_port(port_name):
+    with _ports_lock:
+        entry = _ports.pop(port_name, None)
+    if entry is not None:
+        with entry[1]:
+            if entry[0] is not None:
+                entry[0].close()
 
-def send_topology_data(data):
-    topology_value = int(data)
 
-    # 配置串口参数
+class _TimedMatrixSender(MatrixSender):
+    """带校验和计时的发送器，仅在指标开启时使用"""
 
+    def __init__(self, matrix_id: int = 0):
+        super().__init__(matrix_id)
+        self.checksum_seconds = 0.0  # 累计校验和耗时，用于从 encode 阶段中扣除
+
+    def _calc_checksum(self, data: bytes) -> int:
+        start = time.perf_counter()
+        checksum = super()._calc_checksum(data)
+        elapsed = time.perf_counter() - start
+        self.checksum_seconds += elapsed
+        metrics_service.observe('yorohil_upload_stage_seconds', elapsed, stage='checksum')
+        return checksum
+
+
+def build_topology_table():
     attrU = 1
     attrL = 2
     attrC = 3
@@ -57,49 +119,146 @@ def send_topology_data(data):
             },
         }
     }
+    return data_dict
+
+
+def build_packets(topology_data: dict, matrix_id: int = 0, compact: bool = False) -> list:
+    """
+    按协议顺序构造一次完整上传的数据包队列
+    超出单帧限制的矩阵以 (开始帧, [分段帧, ...]) 元组出现在队列中，由 write_packets 按窗口确认发送
+    compact=True 时每个矩阵选用最短的紧凑编码（需下位机固件支持）
+    """
+    sender = _make_sender(matrix_id)
+    # 构造发送数据包队列
+    packets = []
+
+    # 发送id指定
+    packets.append(sender.send_matrix_id())
+
+    # 1. 清除矩阵
+    packets.append(sender.send_clear())
+
+    # 2. 发送当前拓扑所有配置数据
+    packets += _matrix_packets(sender, topology_data, compact)
+
+    # 3. 启动仿真
+    packets.append(sender.send_start())
+    return packets
+
+
+def build_update_packets(updates: dict, matrix_id: int = 0, compact: bool = False) -> list:
+    """
+    构造增量更新的数据包队列：停止仿真后仅重发变化的矩阵，再重新启动（不清除其余矩阵）
+    """
+    sender = _make_sender(matrix_id)
+    packets = [sender.send_matrix_id(), sender.send_stop()]
+    packets += _matrix_packets(sender, updates, compact)
+    packets.append(sender.send_start())
+    return packets
+
+
+def build_release_packets(matrix_id: int) -> list:
+    """构造释放某个 matrix_id 的数据包队列：停止仿真并清除该 id 上的矩阵"""
+    sender = _make_sender(matrix_id)
+    return [sender.send_matrix_id(), sender.send_stop(), sender.send_clear()]
+
+
+def _make_sender(matrix_id: int) -> MatrixSender:
+    return _TimedMatrixSender(matrix_id=matrix_id) if metrics_service.enabled else MatrixSender(matrix_id=matrix_id)
+
+
+def _matrix_packets(sender: MatrixSender, topology_data: dict, compact: bool) -> list:
+    """按协议顺序编码拓扑中出现的矩阵"""
+    # 协议命令映射表（字段名: 生成函数）
+    packet_map = {
+        "A": sender.send_A,
+        "G_inv": sender.send_G_inv,
+        "YL": sender.send_YL,
+        "YC": sender.send_YC,
+        "YR": sender.send_YR,
+        "J": sender.send_J,
+        "attr": sender.send_attr
+    }
+    timed = isinstance(sender, _TimedMatrixSender)
+    packets = []
+    for key, func in packet_map.items():
+        if key in topology_data:
+            start = time.perf_counter()
+            checksum_before = sender.checksum_seconds if timed else 0.0
+            if compact or needs_segmentation(MATRIX_NAMES[key], topology_data[key]):
+                packet = sender.send_encoded(MATRIX_NAMES[key], topology_data[key], compact=compact)
+            else:
+                packet = func(topology_data[key])
+            if timed:
+                # encode 阶段扣除其中的 checksum 耗时，各阶段互不重叠
+                elapsed = time.perf_counter() - start - (sender.checksum_seconds - checksum_before)
+                metrics_service.observe('yorohil_upload_stage_seconds', elapsed, stage='encode')
+            packets.append(packet)
+    return packets
+
+
+def _frame_label(frame: bytes) -> str:
+    """按帧命令字给出 yorohil_frames_sent_total 的 cmd 标签"""
+    cmd, = struct.unpack_from('>H', frame)
+    return MATRIX_CMDS.get(cmd & 0xFF, 'control')
+
+
+def write_packets(port_name, packets, baud: int = None):
+    """向串口写入数据包（阻塞，运行于工作线程）"""
+    metrics_service.set_gauge('yorohil_serial_queue_depth', len(packets), port=port_name)
+    with acquire_port(port_name, baud) as ser:
+        batch = []
+        for packet in packets + [None]:
+            if isinstance(packet, bytes):
+                batch.append(packet)
+                continue
+            # 连续的普通帧合并为一次写入
+            if batch:
+                payload = b''.join(batch)
+                with metrics_service.timer('yorohil_upload_stage_seconds', stage='write'):
+                    ser.write(payload)
+                capture_service.record(DIR_OUT, batch)
+                metrics_service.inc('yorohil_serial_bytes_sent_total', len(payload), port=port_name)
+                # 写入成功后才计入已发送帧数
+                for frame in batch:
+                    metrics_service.inc('yorohil_frames_sent_total', cmd=_frame_label(frame))
+                batch = []
+            if packet is not None:
+                _write_segmented(ser, packet, baud or BAUD_RATE, port_name)
+
+
+def _write_segmented(ser, packet: tuple, baud: int, port_name):
+    """按窗口确认发送一个分段矩阵"""
+    begin, fragments = packet
+    transfer = SegmentedTransfer(ser, window=SEGMENT_WINDOW, baud=baud,
+                                 on_write=lambda frame: capture_service.record(DIR_OUT, frame),
+                                 on_read=lambda chunk: capture_service.record(DIR_IN, chunk))
+    with metrics_service.timer('yorohil_upload_stage_seconds', stage='segmented'):
+        result = transfer.run(begin, fragments)
+    metrics_service.inc('yorohil_serial_bytes_sent_total', result["bytes"], port=port_name)
+    metrics_service.inc('yorohil_segment_retransmits_total', result["retransmits"], port=port_name)
+    target = MATRIX_CMDS.get(struct.unpack_from('>H', begin, 6)[0] & 0xFF, 'control')
+    metrics_service.inc('yorohil_frames_sent_total', result["fragments"] + 1, cmd=target)
+
+
+def open_port(port_name, baud: int = None):
+    """打开（或确认已打开）串口（阻塞，运行于工作线程）"""
+    with acquire_port(port_name, baud):
+        pass
+
+
+def send_topology_data(data):
+    """向默认设备上传内置拓扑"""
+    from backend.services.device_service import device_registry, DEFAULT_DEVICE
+
+    with metrics_service.timer('yorohil_upload_stage_seconds', stage='build'):
+        data_dict = build_topology_table()
 
     try:
-        sender = MatrixSender(matrix_id=0)
-        # 协议命令映射表（字段名: 生成函数）
-        packet_map = {
-            "A": sender.send_A,
-            "G_inv": sender.send_G_inv,
-            "YL": sender.send_YL,
-            "YC": sender.send_YC,
-            "YR": sender.send_YR,
-            "J": sender.send_J,
-            "attr": sender.send_attr
-        }
-        # 构造发送数据包队列
-        packets = []
-
-        # 发送id指定
-        packets.append(sender.send_matrix_id())
-
-        # 1. 清除矩阵
-        packets.append(sender.send_clear())
-
-        # 2. 发送当前拓扑所有配置数据
-        topology_data = data_dict[topology_value][1]
-        for key, func in packet_map.items():
-            if key in topology_data:
-                packets.append(func(topology_data[key]))
-
-        # 3. 启动仿真（启动matrix_id=1）
-        packets.append(sender.send_start())
-
-        # 串口数据发送
-        with serial.Serial(COM_PORT, BAUD_RATE, timeout=1) as ser:
-            ser.write(b''.join(packets))
-
-        # except KeyError as e:
-        #     print(f"无效拓扑配置: {str(e)}")
-        # except ValueError as e:
-        #     print(f"数据验证失败: {str(e)}")
-        # except serial.SerialException as e:
-        #     print(f"串口通信失败: {str(e)}")
-        # except Exception as e:
-        #     print(f"未知错误: {str(e)}")
+        topology_data = data_dict[int(data)][1]
+        result = device_registry.upload([DEFAULT_DEVICE], topology_data)[DEFAULT_DEVICE]
+        if result["status"] != "OK":
+            raise RuntimeError(result["reason"])
     except Exception as e:
         return jsonify({"status": "ERR", "reason": str(e)}), 400
 
@@ -107,16 +266,14 @@ def send_topology_data(data):
 
 
 def setComPort(port_name):
-    global COM_PORT
-    global BAUD_RATE
+    from backend.services.device_service import device_registry, DEFAULT_DEVICE
 
     available_ports = [port.device for port in serial.tools.list_ports.comports()]
-    if port_name not in available_ports:
+    if port_name not in available_ports and port_name != LOCAL_PORT:
         return jsonify({"status": "ERR", "reason": "无效的串口"}), 400
 
     try:
-        COM_PORT = port_name
-        ser = serial.Serial(COM_PORT, BAUD_RATE, timeout=1)
+        device_registry.set_port(DEFAULT_DEVICE, port_name)
     except Exception as e:
         return jsonify({"status": "ERR", "reason": str(e)})
 
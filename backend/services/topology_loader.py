@@ -0,0 +1,217 @@
+# services/topology_loader.py
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+
+from backend.protocol.inLoop import MATRIX_NAMES, SEGMENT_BEGIN_SEQ, DEFAULT_FRAGMENT_SIZE
+
+NPY_MAGIC = b'\x93NUMPY'
+NPZ_MAGIC = b'PK\x03\x04'
+PACKED_MAGIC = b'YHTP'  # 打包容器：魔数(4) | 版本(1) | 数组数(1) | 数组描述 × N | 数据 × N
+PACKED_DTYPES = {b'b': np.dtype(np.int8), b'f': np.dtype('<f4'), b'd': np.dtype('<f8')}
+
+MAX_UPLOAD_BYTES = int(os.environ.get('YOROHIL_MAX_UPLOAD', 256 * 1024 * 1024))
+MAX_DIM = 0xFFFF  # 分段传输行列数字段为 16 位
+MAX_MATRIX_BYTES = (SEGMENT_BEGIN_SEQ - 1) * DEFAULT_FRAGMENT_SIZE  # 分段数字段为 16 位
+SPOOL_SIZE = 8 * 1024 * 1024  # npz 需要随机访问，超过该大小时落盘
+
+
+class TopologyFormatError(ValueError):
+    pass
+
+
+class _PrefixedStream:
+    """将已读出的前缀字节拼回流的开头，用于嗅探格式"""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            if size < 0:
+                data, self._prefix = self._prefix + self._stream.read(), b''
+                return data
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            if len(data) < size:
+                data += self._stream.read(size - len(data))
+            return data
+        return self._stream.read(size)
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        if self._prefix:
+            n = min(len(self._prefix), len(view))
+            view[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        if hasattr(self._stream, 'readinto'):
+            return self._stream.readinto(view)
+        data = self._stream.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+
+def _read_exact(stream, size: int) -> bytes:
+    data = stream.read(size)
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise TopologyFormatError("数据提前结束")
+        data += chunk
+    return data
+
+
+def _read_into(stream, array: np.ndarray):
+    """将流中的原始字节直接读入数组内存，不经过中间 Python 对象"""
+    view = memoryview(array.reshape(-1).view(np.uint8))
+    pos = 0
+    while pos < len(view):
+        n = stream.readinto(view[pos:])
+        if not n:
+            raise TopologyFormatError("数据提前结束")
+        pos += n
+
+
+def validate_shape(name: str, shape: tuple, dtype: np.dtype):
+    """按协议限制检查单个数组（读取数据之前调用）"""
+    if name == 'dt':
+        if int(np.prod(shape)) != 1:
+            raise TopologyFormatError("dt 必须为标量")
+        return
+    if name not in MATRIX_NAMES:
+        raise TopologyFormatError(f"未知的矩阵名 {name}")
+    if dtype.kind not in 'iuf':
+        raise TopologyFormatError(f"{name} 数据类型 {dtype} 不受支持")
+    if len(shape) == 1 and name != 'A' and name != 'G_inv':
+        shape = (shape[0], 1)
+    if len(shape) != 2:
+        raise TopologyFormatError(f"{name} 必须为二维数组")
+    if max(shape) > MAX_DIM:
+        raise TopologyFormatError(f"{name} 维度 {shape} 超过 {MAX_DIM} 限制")
+    itemsize = 1 if name == 'A' else 4
+    if shape[0] * shape[1] * itemsize > MAX_MATRIX_BYTES:
+        raise TopologyFormatError(f"{name} 数据量超过分段传输上限")
+    if name == 'G_inv' and shape[0] != shape[1]:
+        raise TopologyFormatError("G_inv必须为方阵")
+    if name not in ('A', 'G_inv') and shape[1] != 1:
+        raise TopologyFormatError(f"{name}必须为单列向量")
+
+
+def validate_topology(topology: dict) -> dict:
+    """检查各矩阵之间的维度一致性，并将一维向量整理为列向量"""
+    if 'A' not in topology:
+        raise TopologyFormatError("缺少 A 矩阵")
+    A = topology['A']
+    if not np.isin(A, (-1, 0, 1)).all():
+        raise TopologyFormatError("A矩阵元素必须为 -1/0/1")
+    topology['A'] = A.astype(np.int8, copy=False)
+    n_node, n_branch = A.shape
+    if 'G_inv' in topology and topology['G_inv'].shape != (n_node, n_node):
+        raise TopologyFormatError(f"G_inv 应为 {n_node}×{n_node}")
+    for name in ('YL', 'YC', 'YR', 'J', 'attr'):
+        if name in topology:
+            topology[name] = topology[name].reshape(-1, 1)
+            if topology[name].shape[0] != n_branch:
+                raise TopologyFormatError(f"{name} 长度应为支路数 {n_branch}")
+    if 'dt' in topology:
+        topology['dt'] = float(np.asarray(topology['dt']).reshape(-1)[0])
+    return topology
+
+
+def read_npy(stream, name: str) -> np.ndarray:
+    """流式读取 .npy：先解析头部并校验形状，再把数据直接读入预分配数组"""
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    if dtype.hasobject:
+        raise TopologyFormatError("不支持包含 Python 对象的数组")
+    validate_shape(name, shape, dtype)
+    array = np.empty(shape, dtype=dtype, order='F' if fortran_order else 'C')
+    _read_into(stream, array.T if fortran_order else array)
+    return array
+
+
+def read_npz(stream) -> dict:
+    """npz 为 zip 容器需随机访问：先流式转存（小文件在内存），再逐个成员流式解析"""
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+        shutil.copyfileobj(stream, spool, 1024 * 1024)
+        spool.seek(0)
+        try:
+            archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile as e:
+            raise TopologyFormatError(str(e))
+        with archive:
+            members = [info for info in archive.infolist() if info.filename.endswith('.npy')]
+            # 先读取所有成员的头部完成校验，再读取数据
+            for info in members:
+                with archive.open(info) as member:
+                    version = np.lib.format.read_magic(member)
+                    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+                        else np.lib.format.read_array_header_2_0
+                    shape, _, dtype = read_header(member)
+                    validate_shape(info.filename[:-4], shape, dtype)
+            topology = {}
+            for info in members:
+                with archive.open(info) as member:
+                    topology[info.filename[:-4]] = read_npy(member, info.filename[:-4])
+    return topology
+
+
+def read_packed(stream) -> dict:
+    """
+    读取打包容器（小端序）
+    头部：魔数 'YHTP' | 版本(1)=1 | 数组数(1)
+    描述：名称长度(1) | 名称 | 类型('b'/'f'/'d') | 维数(1) | 各维长度(u32 × 维数)
+    数据：按描述顺序紧密排列的原始数组
+    """
+    if _read_exact(stream, 4) != PACKED_MAGIC:
+        raise TopologyFormatError("不是有效的打包容器")
+    version, count = struct.unpack('<BB', _read_exact(stream, 2))
+    if version != 1:
+        raise TopologyFormatError(f"不支持的容器版本 {version}")
+    descriptors = []
+    for _ in range(count):
+        name = _read_exact(stream, _read_exact(stream, 1)[0]).decode('ascii')
+        code = _read_exact(stream, 1)
+        if code not in PACKED_DTYPES:
+            raise TopologyFormatError(f"{name} 类型代码 {code!r} 无效")
+        ndim = _read_exact(stream, 1)[0]
+        shape = struct.unpack(f'<{ndim}I', _read_exact(stream, 4 * ndim))
+        validate_shape(name, shape, PACKED_DTYPES[code])
+        descriptors.append((name, PACKED_DTYPES[code], shape))
+    topology = {}
+    for name, dtype, shape in descriptors:
+        array = np.empty(shape, dtype=dtype)
+        _read_into(stream, array)
+        topology[name] = array
+    return topology
+
+
+def load_topology(stream, name: str = None, base: dict = None) -> dict:
+    """
+    按内容嗅探格式（.npy / .npz / 打包容器），流式解析为 {矩阵名: ndarray}
+    :param name: 单个 .npy 时对应的矩阵名
+    :param base: 在已有拓扑基础上替换部分矩阵（如单个 .npy 只更新 G_inv）
+    """
+    prefix = _read_exact(stream, 4)
+    stream = _PrefixedStream(prefix, stream)
+    if prefix == NPZ_MAGIC:
+        topology = read_npz(stream)
+    elif prefix == PACKED_MAGIC:
+        topology = read_packed(stream)
+    elif prefix == NPY_MAGIC[:4]:
+        if name is None:
+            raise TopologyFormatError("单个 .npy 需指定矩阵名 name")
+        topology = {name: read_npy(stream, name)}
+    else:
+        raise TopologyFormatError("无法识别的数据格式")
+    if base is not None:
+        topology = {**base, **topology}
+    return validate_topology(topology)
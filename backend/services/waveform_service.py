@@ -0,0 +1,281 @@
+# services/waveform_service.py
+import json
+import os
+from threading import Lock
+
+import numpy as np
+
+from backend.sys.sysData import data_path
+
+WAVEFORM_DIR = 'waveforms'
+LOD_FACTOR = 16  # 每级细节层次的抽样倍数
+SAMPLE_DTYPE = np.dtype('<f4')
+
+
+def _check_name(name, kind: str):
+    """名称将直接用作文件 / 目录名：不能为空、不能含路径分隔符、不能以 . 开头"""
+    if not isinstance(name, str) or not name or name.startswith('.') or any(sep in name for sep in '/\\'):
+        raise ValueError(f"无效的{kind}: {name}")
+
+
+def _rec_dir(name: str) -> str:
+    _check_name(name, '录制名称')
+    return os.path.dirname(data_path(WAVEFORM_DIR, name, 'meta.json'))
+
+
+def _level_file(rec_dir: str, channel: str, level: int) -> str:
+    return os.path.join(rec_dir, f'{channel}.L{level}.f4')
+
+
+class _ChannelWriter:
+    """单通道的原始数据与 min/max 金字塔写入器（均为只追加文件）"""
+
+    def __init__(self, rec_dir: str, channel: str):
+        self.rec_dir = rec_dir
+        self.channel = channel
+        self.files = []  # 第 k 个元素为第 k 级文件句柄
+        self.counts = []  # 第 k 级已写入的元素个数（float32 个数）
+        self.pending = []  # 第 k 级尚未凑满一个分组的数据（k>=1 为 [min,max] 交错）
+        self._open_level(0)
+
+    def _open_level(self, level: int):
+        self.files.append(open(_level_file(self.rec_dir, self.channel, level), 'ab'))
+        self.counts.append(0)
+        self.pending.append(np.empty(0, dtype=SAMPLE_DTYPE))
+
+    def _write(self, level: int, data: np.ndarray):
+        self.files[level].write(data.tobytes())
+        self.counts[level] += len(data)
+
+    def append(self, values: np.ndarray):
+        values = np.ascontiguousarray(values, dtype=SAMPLE_DTYPE)
+        self._write(0, values)
+        # 第 1 级：每 LOD_FACTOR 个原始点取 min/max
+        data = np.concatenate((self.pending[0], values))
+        full = len(data) - len(data) % LOD_FACTOR
+        self.pending[0] = data[full:]
+        if not full:
+            return
+        groups = data[:full].reshape(-1, LOD_FACTOR)
+        pairs = np.column_stack((groups.min(axis=1), groups.max(axis=1))).ravel()
+        self._push(1, pairs)
+
+    def _push(self, level: int, pairs: np.ndarray):
+        if level >= len(self.files):
+            self._open_level(level)
+        self._write(level, pairs)
+        # 向上一级汇总：每 LOD_FACTOR 个 [min,max] 对合并为一个
+        data = np.concatenate((self.pending[level], pairs))
+        width = 2 * LOD_FACTOR
+        full = len(data) - len(data) % width
+        self.pending[level] = data[full:]
+        if not full:
+            return
+        groups = data[:full].reshape(-1, LOD_FACTOR, 2)
+        merged = np.column_stack((groups[:, :, 0].min(axis=1), groups[:, :, 1].max(axis=1))).ravel()
+        self._push(level + 1, merged)
+
+    def tails(self) -> list:
+        """
+        各级末尾尚未凑满分组的部分的 [min, max]（第 0 级恒为 None）
+        第 k 级的末尾分组覆盖第 0 ~ k-1 级 pending 中的全部原始点
+        """
+        tails = [None]
+        lo = hi = None
+        for level in range(1, len(self.files)):
+            prev = self.pending[level - 1]
+            if len(prev):
+                prev_lo, prev_hi = (prev.min(), prev.max()) if level == 1 else (prev[0::2].min(), prev[1::2].max())
+                lo = prev_lo if lo is None else min(lo, prev_lo)
+                hi = prev_hi if hi is None else max(hi, prev_hi)
+            tails.append(None if lo is None else np.array([lo, hi], dtype=SAMPLE_DTYPE))
+        return tails
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+
+    def close(self):
+        # 录制结束时把各级末尾的不完整分组写出，保证粗层级覆盖全部采样
+        for level, tail in enumerate(self.tails()):
+            if tail is not None:
+                self._write(level, tail)
+        for f in self.files:
+            f.close()
+
+    def discard(self):
+        for level, f in enumerate(self.files):
+            f.close()
+            os.remove(_level_file(self.rec_dir, self.channel, level))
+
+
+class WaveformService:
+    """
+    波形归档：遥测数据按通道列式写入磁盘，同时增量构建 min/max 细节层次金字塔
+    - 第 0 级为原始采样（float32），第 k 级每点为 LOD_FACTOR**k 个原始点的 [min, max]
+    - 查询时根据时间范围与目标点数选择层级，仅通过 memmap 读取所需区间
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._writers = None
+        self.meta = None
+        self.rec_dir = None
+
+    @property
+    def recording(self) -> bool:
+        return self._writers is not None
+
+    def start(self, name: str, channels: list, dt: float, t0: float = 0.0) -> dict:
+        # 先完成全部校验，再创建通道文件，最后写入 meta.json（目录中有 meta.json 即为完整录制）
+        _check_name(name, '录制名称')
+        if isinstance(channels, str) or not channels:
+            raise ValueError("通道列表不能为空")
+        channels = list(channels)
+        for channel in channels:
+            _check_name(channel, '通道名称')
+        if len(set(channels)) != len(channels):
+            raise ValueError("通道名称重复")
+        dt, t0 = float(dt), float(t0)
+        if not dt > 0:
+            raise ValueError("采样间隔 dt 必须为正数")
+        with self._lock:
+            if self._writers is not None:
+                raise RuntimeError(f"正在录制 {self.meta['name']}")
+            rec_dir = _rec_dir(name)
+            if os.path.exists(os.path.join(rec_dir, 'meta.json')):
+                raise ValueError(f"录制 {name} 已存在")
+            meta = {"name": name, "channels": channels, "dt": dt, "t0": t0,
+                    "lod_factor": LOD_FACTOR, "dtype": SAMPLE_DTYPE.str}
+            writers = {}
+            try:
+                for channel in channels:
+                    writers[channel] = _ChannelWriter(rec_dir, channel)
+                with open(os.path.join(rec_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+            except OSError:
+                for writer in writers.values():
+                    writer.discard()
+                raise
+            self.rec_dir = rec_dir
+            self.meta = meta
+            self._writers = writers
+            return self.meta
+
+    def append(self, samples):
+        """
+        追加一批采样
+        :param samples: {通道名: 一维数组}，或形状为 (n, 通道数) 的二维数组
+        """
+        with self._lock:
+            if self._writers is None:
+                return
+            channels = self.meta['channels']
+            if isinstance(samples, dict):
+                if set(samples) != set(channels):
+                    raise ValueError(f"需提供全部通道 {channels} 的数据")
+                columns = [np.asarray(samples[channel], dtype=SAMPLE_DTYPE).reshape(-1) for channel in channels]
+                if len({len(column) for column in columns}) != 1:
+                    raise ValueError("各通道的采样点数必须一致")
+            else:
+                samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+                if samples.ndim != 2 or samples.shape[1] != len(channels):
+                    raise ValueError(f"采样数据应为 (n, {len(channels)}) 的二维数组")
+                columns = samples.T
+            for channel, values in zip(channels, columns):
+                self._writers[channel].append(values)
+
+    def stop(self):
+        with self._lock:
+            if self._writers is None:
+                return
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = None
+
+    @staticmethod
+    def list_recordings() -> list:
+        root = os.path.dirname(data_path(WAVEFORM_DIR, 'x'))
+        recordings = []
+        for name in sorted(os.listdir(root)):
+            meta_path = os.path.join(root, name, 'meta.json')
+            if not os.path.exists(meta_path):
+                continue
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+                size = os.path.getsize(_level_file(os.path.join(root, name), meta['channels'][0], 0))
+            except (OSError, ValueError, KeyError, IndexError, TypeError):
+                continue  # 跳过损坏的录制
+            meta['samples'] = size // SAMPLE_DTYPE.itemsize
+            recordings.append(meta)
+        return recordings
+
+    def query(self, name: str, channel: str, start: float = None, end: float = None,
+              points: int = 2000) -> dict:
+        """
+        读取任意时间范围、任意缩放级别的波形
+        :return: level=0 时返回 values，否则返回每个分组的 min / max
+        """
+        rec_dir = _rec_dir(name)
+        with open(os.path.join(rec_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if channel not in meta['channels']:
+            raise KeyError(f"通道 {channel} 不存在")
+        dt, t0, factor = meta['dt'], meta['t0'], meta['lod_factor']
+
+        # 正在录制时以写入器的计数为准，并带上各级末尾未凑满的分组
+        counts = tails = None
+        with self._lock:
+            if self._writers is not None and self.meta['name'] == name:
+                writer = self._writers[channel]
+                writer.flush()
+                counts = list(writer.counts)
+                tails = writer.tails()
+
+        if counts is not None:
+            total = counts[0]
+        else:
+            total = os.path.getsize(_level_file(rec_dir, channel, 0)) // SAMPLE_DTYPE.itemsize
+        i0 = 0 if start is None else max(0, int((start - t0) / dt))
+        i1 = total if end is None else min(total, int(np.ceil((end - t0) / dt)))
+        points = max(1, int(points))
+
+        # 选择满足点数要求的最细层级
+        level = 0
+        while (i1 - i0) / factor ** level > points and \
+                (len(counts) > level + 1 if counts is not None
+                 else os.path.exists(_level_file(rec_dir, channel, level + 1))):
+            level += 1
+
+        step = factor ** level
+        path = _level_file(rec_dir, channel, level)
+        width = 1 if level == 0 else 2
+        if counts is not None:
+            stored = counts[level] // width
+        else:
+            stored = os.path.getsize(path) // (SAMPLE_DTYPE.itemsize * width)
+        tail = tails[level] if tails is not None else None
+        count = stored + (tail is not None)
+        j0 = min(i0 // step, count)
+        j1 = min(-(-i1 // step), count)
+        result = {"name": name, "channel": channel, "level": level,
+                  "t0": t0 + j0 * step * dt, "dt": step * dt}
+        if j1 <= j0:
+            result.update({"values": []} if level == 0 else {"min": [], "max": []})
+            return result
+        data = np.memmap(path, dtype=SAMPLE_DTYPE, mode='r', shape=(stored * width,)) if stored else \
+            np.empty(0, dtype=SAMPLE_DTYPE)
+        if level == 0:
+            result["values"] = np.array(data[j0:j1]).tolist()
+        else:
+            pairs = np.array(data[2 * j0:2 * min(j1, stored)])
+            if j1 > stored:
+                pairs = np.concatenate((pairs, tail))
+            pairs = pairs.reshape(-1, 2)
+            result["min"] = pairs[:, 0].tolist()
+            result["max"] = pairs[:, 1].tolist()
+        return result
+
+
+waveform_service = WaveformService()
@@ -0,0 +1,11 @@
+import os
+
+# 运行期数据根目录（性能剖析、串口抓包、波形归档等）
+DATA_DIR = os.environ.get('YOROHIL_DATA_DIR', os.path.join(os.getcwd(), 'data'))
+
+
+def data_path(*parts: str) -> str:
+    """返回数据目录下的子路径，并确保其所在目录存在"""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,38 @@
+"""
+串口抓包回放工具
+用法（在项目根目录执行）：
+    python -m tool.replay data/captures/xxx.yhcap --port COM3 --speed 1
+    python -m tool.replay data/captures/xxx.yhcap --local --speed 0
+--speed：1 原速，2 两倍速，0 最快速度
+"""
+import argparse
+
+from backend.protocol.localDevice import LocalDevice
+from backend.services.capture_service import replay_capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放 .yhcap 抓包文件')
+    parser.add_argument('path', help='抓包文件路径')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--port', help='目标串口，如 COM3 或 /dev/ttyUSB0')
+    target.add_argument('--local', action='store_true', help='回放到本地下位机替身')
+    parser.add_argument('--baud', type=int, default=115200, help='波特率')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放速度倍率，0 为最快')
+    args = parser.parse_args()
+
+    if args.local:
+        port = LocalDevice()
+    else:
+        import serial
+        port = serial.Serial(args.port, args.baud, timeout=1)
+
+    with port:
+        result = replay_capture(args.path, port, speed=args.speed)
+        print(f"回放完成：{result['frames']} 帧，{result['bytes']} 字节，耗时 {result['elapsed']:.3f}s")
+        if args.local:
+            print(f"替身状态：帧 {port.frames_received}，丢弃 {port.dropped}，矩阵 {list(port.matrices)}")
+
+
+if __name__ == '__main__':
+    main()